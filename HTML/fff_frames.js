@@ -0,0 +1,142 @@
+// Reader for .fffb frame files written by Python/fff_frames.py
+//
+// Layout (little-endian): 'FFFB', uint32 header length, JSON header, then per
+// frame a 17-byte record (uint32 payload length, float32 time, float32 nozzle x,
+// float32 nozzle z, uint8 flags) followed by a zlib payload of Nz*Nx uint16
+// words (byte-shuffled, row 0 = bed). Non-key frames are deltas to the
+// previous frame (uint16: modulo 2^16, float16: XOR).
+//
+// Usage:
+//     const reader = await FFFFrameReader.fromFile(input.files[0]);
+//     const T = await reader.frame(n);        // array of Nz rows (for Plotly)
+
+const FFF_KEYFRAME = 1;
+const FFF_HAS_NOZZLE = 2;
+
+// float16 bit pattern -> float32, as a lookup table
+let fffHalfTable = null;
+function fffHalfToFloat() {
+    if (fffHalfTable) return fffHalfTable;
+    fffHalfTable = new Float32Array(65536);
+    for (let h = 0; h < 65536; h++) {
+        const sign = h & 0x8000 ? -1 : 1;
+        const exponent = (h >> 10) & 0x1f;
+        const mantissa = h & 0x3ff;
+        if (exponent === 0) {
+            fffHalfTable[h] = sign * Math.pow(2, -14) * (mantissa / 1024);
+        } else if (exponent === 31) {
+            fffHalfTable[h] = mantissa ? NaN : sign * Infinity;
+        } else {
+            fffHalfTable[h] = sign * Math.pow(2, exponent - 15) * (1 + mantissa / 1024);
+        }
+    }
+    return fffHalfTable;
+}
+
+async function fffInflate(bytes) {
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+    return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+class FFFFrameReader {
+    constructor(buffer) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'FFFB') throw new Error('Not a .fffb frame file');
+        const headerLength = view.getUint32(4, true);
+        this.header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+        this.Nx = this.header.Nx;
+        this.Nz = this.header.Nz;
+        this.buffer = buffer;
+
+        // Index all frame records (payloads stay compressed until requested)
+        this.offsets = [];
+        this.sizes = [];
+        this.times = [];
+        this.nozzle = [];
+        this.keyframes = [];
+        let pos = 8 + headerLength;
+        while (pos < buffer.byteLength) {
+            const size = view.getUint32(pos, true);
+            const flags = view.getUint8(pos + 16);
+            this.times.push(view.getFloat32(pos + 4, true));
+            this.nozzle.push(flags & FFF_HAS_NOZZLE ?
+                [view.getFloat32(pos + 8, true), view.getFloat32(pos + 12, true)] : null);
+            this.keyframes.push((flags & FFF_KEYFRAME) !== 0);
+            this.offsets.push(pos + 17);
+            this.sizes.push(size);
+            pos += 17 + size;
+        }
+        this.count = this.offsets.length;
+        this._words = null;     // decoded uint16 words of frame this._index
+        this._index = -1;
+    }
+
+    static async fromFile(file) {
+        return new FFFFrameReader(await file.arrayBuffer());
+    }
+
+    static async fromURL(url) {
+        const response = await fetch(url);
+        if (!response.ok) throw new Error(`Could not load ${url}`);
+        return new FFFFrameReader(await response.arrayBuffer());
+    }
+
+    async _stored(n) {
+        const bytes = await fffInflate(new Uint8Array(this.buffer, this.offsets[n], this.sizes[n]));
+        const count = this.Nx * this.Nz;
+        const words = new Uint16Array(count);
+        for (let i = 0; i < count; i++) {
+            words[i] = bytes[i] | (bytes[count + i] << 8);
+        }
+        return words;
+    }
+
+    async _decode(n) {
+        // Sequential playback continues from the cached frame, otherwise from the last keyframe
+        let start = n;
+        if (!(this._index >= 0 && this._index < n)) {
+            while (!this.keyframes[start]) start--;
+            this._words = await this._stored(start);
+            this._index = start;
+        }
+        const xor = this.header.encoding === 'float16';
+        for (let m = this._index + 1; m <= n; m++) {
+            const stored = await this._stored(m);
+            if (this.keyframes[m]) {
+                this._words = stored;
+            } else {
+                const words = this._words;
+                for (let i = 0; i < words.length; i++) {
+                    words[i] = xor ? words[i] ^ stored[i] : (words[i] + stored[i]) & 0xffff;
+                }
+            }
+        }
+        this._index = n;
+        return this._words;
+    }
+
+    // Temperature field of frame n as a Float32Array (row-major, row 0 = bed)
+    async values(n) {
+        const words = await this._decode(n);
+        const out = new Float32Array(words.length);
+        if (this.header.encoding === 'float16') {
+            const table = fffHalfToFloat();
+            for (let i = 0; i < words.length; i++) out[i] = table[words[i]];
+        } else {
+            const offset = this.header.offset, scale = this.header.scale;
+            for (let i = 0; i < words.length; i++) out[i] = offset + scale * words[i];
+        }
+        return out;
+    }
+
+    // Temperature field of frame n as an array of Nz rows
+    async frame(n) {
+        const values = await this.values(n);
+        const rows = [];
+        for (let i = 0; i < this.Nz; i++) {
+            rows.push(Array.from(values.subarray(i * this.Nx, (i + 1) * this.Nx)));
+        }
+        return rows;
+    }
+}
@@ -1,5 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from fff_convergence import ConvergenceMonitor
+from fff_profiling import SolverProfiler, print_progress
 
 # -------------------------------------------------
 # 1. Geometry (meters)
@@ -39,13 +41,22 @@ h = 50.0           # convection coefficient W/(m^2 K)
 dt = 0.1           # time step (s)
 t_end = 100.0
 tolerance = 1.6e-2
+steady_time_tol = 0.5  # reported steady time may be late by at most this (s)
+
+# -------------------------------------------------
+# Instrumentation (set enabled=False for zero overhead)
+# -------------------------------------------------
+profiler = SolverProfiler(enabled=True, jsonl_path=None, trace_allocations=False)
+profiler.add_callback(print_progress, every=round(5 / dt))  # Print every ~5 seconds
 
 # -------------------------------------------------
 # 5. Initialize temperature field
 # -------------------------------------------------
 T = np.ones((Nz, Nx)) * T_init
 time = 0.0
+step = 0
 steady_state_time = None
+monitor = ConvergenceMonitor(tolerance, dt, check_every=10, time_tol=steady_time_tol, adaptive=True)
 
 # -------------------------------------------------
 # 6. Time loop
@@ -54,48 +65,56 @@ while time < t_end:
     T_old = T.copy()
 
     # --- Iterative implicit solver (Gauss-Seidel)
-    for _ in range(50):  # instead of 200
-        for i in range(1, Nz-1):
-            for j in range(1, Nx-1):
-                # Implicit scheme: (T - T_old)/dt = alpha * (d²T/dz² + d²T/dx²)
-                # Rearranged for iteration:
-                Fo_z = alpha * dt / dz**2
-                Fo_x = alpha * dt / dx**2
-                T[i, j] = (T_old[i, j] + Fo_z * (T[i+1, j] + T[i-1, j]) + Fo_x * (T[i, j+1] + T[i, j-1])) / (1 + 2*Fo_z + 2*Fo_x)
+    with profiler.phase('diffusion'):
+        for _ in range(50):  # instead of 200
+            for i in range(1, Nz-1):
+                for j in range(1, Nx-1):
+                    # Implicit scheme: (T - T_old)/dt = alpha * (d²T/dz² + d²T/dx²)
+                    # Rearranged for iteration:
+                    Fo_z = alpha * dt / dz**2
+                    Fo_x = alpha * dt / dx**2
+                    T[i, j] = (T_old[i, j] + Fo_z * (T[i+1, j] + T[i-1, j]) + Fo_x * (T[i, j+1] + T[i, j-1])) / (1 + 2*Fo_z + 2*Fo_x)
+    profiler.count('sweeps', 50)
 
     # -------------------------------------------------
     # 7. Boundary conditions
     # -------------------------------------------------
 
-    # Bottom surface (print bed)
-    T[0, :] = T_bed
+    with profiler.phase('boundary'):
+        # Bottom surface (print bed)
+        T[0, :] = T_bed
 
-    # Top surface
-    T[-1, 0] = T_heat  # heated element
+        # Top surface
+        T[-1, 0] = T_heat  # heated element
 
-    for j in range(1, Nx):
-        T[-1, j] = (k * T[-2, j] / dz + h * T_inf) / (k / dz + h)
+        for j in range(1, Nx):
+            T[-1, j] = (k * T[-2, j] / dz + h * T_inf) / (k / dz + h)
 
-    # Left & right (adiabatic)
-    T[:, 0]  = T[:, 1]
-    T[:, -1] = T[:, -2]
+        # Left & right (adiabatic)
+        T[:, 0]  = T[:, 1]
+        T[:, -1] = T[:, -2]
 
     # -------------------------------------------------
     # 8. Steady-state check
     # -------------------------------------------------
-    max_change = np.max(np.abs(T - T_old))
-    if max_change < tolerance:
-        steady_state_time = time
+    if monitor.is_check_step(step):
+        check_time = time  # max_change below is measured at this step
+    with profiler.phase('convergence'):
+        reached = monitor.after_step(step, time, T, T_old=T_old)
+    max_change = monitor.max_change  # from the most recent check
+    if reached:
+        steady_state_time = monitor.steady_time
         print(f"\n{'='*50}")
         print(f"✓ STEADY STATE REACHED")
         print(f"Steady state time: {steady_state_time:.2f} s")
         print(f"Max change: {max_change:.2e}")
         print(f"{'='*50}\n")
         break
-    
-    if time % 5 < dt:  # Print every ~5 seconds
-        print(f"t = {time:.1f} s, max_change = {max_change:.2e}")
 
+    # Between checks max_change is stale; report when it was measured
+    profiler.step(step, time, max_change=max_change, check_time=check_time)
+
+    step += 1
     time += dt
 
 # If loop ends without steady state
@@ -103,6 +122,9 @@ if steady_state_time is None:
     print(f"\nTime loop ended at t = {time:.1f} s without reaching steady state")
     print(f"Final max_change = {max_change:.2e} (tolerance = {tolerance:.2e})")
 
+print(profiler.report())
+profiler.close()
+
 # -------------------------------------------------
 # 9. Post-processing plots
 # -------------------------------------------------
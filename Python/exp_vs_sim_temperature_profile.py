@@ -1,19 +1,73 @@
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+from fff_calibration import BatchedWallModel, calibrate, load_measurements, zigzag_path
+
 # Experimental data from Task 1 (example values from extracted HTML)
 # 5-10mm below nozzle: 83.5°C
 # Wall: 25-50°C (varies with position)
 exp_z = np.array([0, 5, 10, 20])  # mm from nozzle downward
 exp_temp = np.array([150, 83.5, 50, 25])  # Estimated: nozzle exit, 5-10mm, wall, base
 
-# Simulated profile (example, adjust as needed)
+# Wall geometry for Task 1: nozzle on top of a 20 mm wall, base at 25°C
+Lx = 0.05
+Lz = 0.02
+Nx, Nz = 60, 41
+dt = 0.5             # implicit steps; long run so the wall heats up layer after layer
+timesteps = 1200
+dz = Lz / (Nz - 1)
+z_nozzle = Lz - dz                      # nozzle deposits into the top layer
+path = zigzag_path(Lx, z_nozzle, steps_per_pass=200)
+x_probe = path(timesteps - 1)[0]        # measured directly below the final nozzle position
+
+# Measured profile: from a CSV (time,x_mm,z_mm,T) if given, else the Task 1 points
+if len(sys.argv) > 1:
+    measurements = load_measurements(sys.argv[1])
+else:
+    measurements = {
+        'time': np.full(len(exp_z), np.nan),                     # end of the run
+        'x': np.full(len(exp_z), x_probe),
+        'z': np.clip(z_nozzle - exp_z / 1000.0, 0.0, Lz),
+        'T': exp_temp.astype(float),
+    }
+
+model = BatchedWallModel(measurements, Lx=Lx, Lz=Lz, Nx=Nx, Nz=Nz, T_bed=25.0, T_inf=20.0,
+                         T_nozzle=210.0, dt=dt, timesteps=timesteps, path=path)
+
+print("Calibrating h, alpha and nozzle blend factor against the measured profile...")
+result = calibrate(model, measurements['T'],
+                   initial=[15.0, 1.39e-7, 0.8],
+                   lower=[1.0, 2e-8, 0.01], upper=[200.0, 2e-6, 1.0])
+params = result['params']
+reliable = result['converged'] and not result['at_bounds']
+fitted = (f"h = {params['h']:.2f} W/m²K, alpha = {params['alpha']:.3e} m²/s, "
+          f"blend = {params['blend']:.3f}")
+if reliable:
+    print(f"\nCalibrated: {fitted}")
+else:
+    problems = []
+    if not result['converged']:
+        problems.append(f"not converged in {result['iterations']} iterations")
+    if result['at_bounds']:
+        problems.append(f"on a bound: {', '.join(result['at_bounds'])}")
+    print(f"\n⚠ Calibration unreliable ({'; '.join(problems)}): {fitted}")
+sim_label = 'Simulation (calibrated)' if reliable else f"Simulation (unreliable fit: {'; '.join(problems)})"
+print(f"RMS error = {result['rms']:.2f}°C after {result['iterations']} iterations "
+      f"({result['forward_runs']} forward runs, {result['cache_hits']} cache hits)")
+
+# Simulated profile below the nozzle with the calibrated parameters
 sim_z = np.linspace(0, 20, 100)
-sim_temp = 85 - 3*sim_z + 10*np.exp(-sim_z/3)  # Example: starts at 85°C, drops with z
+profile = {'time': np.full(sim_z.shape, np.nan), 'x': np.full(sim_z.shape, x_probe),
+           'z': np.clip(z_nozzle - sim_z / 1000.0, 0.0, Lz), 'T': np.zeros(sim_z.shape)}
+profile_model = BatchedWallModel(profile, Lx=Lx, Lz=Lz, Nx=Nx, Nz=Nz, T_bed=25.0, T_inf=20.0,
+                                 T_nozzle=210.0, dt=dt, timesteps=timesteps, path=path)
+sim_temp = profile_model([params['h'], params['alpha'], params['blend']])[0]
 
 plt.figure(figsize=(7,5))
 plt.plot(exp_z, exp_temp, 'o-', label='Experimental (Task 1)', linewidth=2, markersize=8)
-plt.plot(sim_z, sim_temp, '--', label='Simulation (Task 3)', linewidth=2)
+plt.plot(sim_z, sim_temp, '--', label=sim_label, linewidth=2)
 plt.xlabel('Distance from Nozzle (mm)')
 plt.ylabel('Temperature (°C)')
 plt.title('Vertical Temperature Profile: Experiment vs Simulation')
@@ -21,4 +75,4 @@ plt.legend()
 plt.grid(True)
 plt.tight_layout()
 plt.savefig('exp_vs_sim_temperature_profile.png')
-plt.show()
\ No newline at end of file
+plt.show()
@@ -0,0 +1,288 @@
+"""
+Analytic moving-heat-source estimator (Rosenthal / Green's function).
+
+For screening toolpaths the finite-difference field of
+validate_realistic_fff.py is often more than needed. This module estimates
+the temperature rise of the wall cross-section analytically:
+
+  - the deposited bead acts as a line source perpendicular to the x-z plane.
+    Its history is superposed as instantaneous Gaussian sources (the exact
+    Green's function of the heat equation, smeared over the nozzle radius
+    so it stays finite at the source),
+  - the bed (fixed temperature) is an antisymmetric image, the top is
+    treated as adiabatic (symmetric images, h*Lz/k ~ 0.3 here) and the
+    side walls optionally as adiabatic mirrors,
+  - rosenthal_line gives the quasi-steady solution for a source moving at
+    constant speed, with the same images.
+
+Everything is vectorized over probes × evaluation times × source history.
+The estimator can be used for "peak interface temperature along this path"
+queries (peak_temperature), as a far-field correction from old deposits
+(temperature(..., before=t_cut)) or as an initial field for the numerical
+solver (field).
+
+Convective loss through the top and the temperature dependence of the
+properties are neglected; fit_power matches the source strength to a
+numerical run or to measurements.
+"""
+
+import numpy as np
+
+
+def bessel_k0(x):
+    """Modified Bessel function K0 (Abramowitz & Stegun 9.8.5/9.8.6, |error| < 1e-7)"""
+    x = np.asarray(x, dtype=float)
+    small = x <= 2.0
+    out = np.empty_like(x)
+    xs = x[small]
+    t = (xs / 2.0)**2
+    out[small] = (-np.log(xs / 2.0) * np.i0(xs) - 0.57721566 +
+                  t * (0.42278420 + t * (0.23069756 + t * (0.03488590 + t * (0.00262698 +
+                  t * (0.00010750 + t * 0.00000740))))))
+    out[~small] = np.exp(-x[~small]) * _k0_large(x[~small])
+    return out
+
+
+def _k0_large(x):
+    """exp(x) * K0(x) for x >= 2"""
+    y = 2.0 / x
+    return (1.25331414 + y * (-0.07832358 + y * (0.02189568 + y * (-0.01062446 +
+            y * (0.00587872 + y * (-0.00251540 + y * 0.00053208)))))) / np.sqrt(x)
+
+
+def image_sources(z_source, Lz=None, periods=0):
+    """Image heights and signs for a fixed-temperature bed at z=0.
+
+    With Lz the top z=Lz is adiabatic and the image series (period 4 Lz) is
+    extended by `periods` periods on each side; without it the wall is
+    semi-infinite and only the bed image is used.
+    Returns (heights, signs) with the real source first.
+    """
+    if Lz is None:
+        return np.array([z_source, -z_source]), np.array([1.0, -1.0])
+    base = np.array([z_source, -z_source, 2*Lz - z_source, z_source - 2*Lz])
+    signs = np.array([1.0, -1.0, 1.0, -1.0])
+    shifts = 4 * Lz * np.arange(-periods, periods + 1)
+    heights = (base[None, :] + shifts[:, None]).ravel()
+    order = np.argsort(np.abs(heights - z_source), kind='stable')
+    return heights[order], np.tile(signs, len(shifts))[order]
+
+
+def rosenthal_line(xi, z, z_source, v, power, k=0.25, alpha=1.39e-7, Lz=None, periods=0):
+    """Quasi-steady temperature rise of a line source moving at speed v along x.
+
+    xi is the distance ahead of the source (x - x_source), z the height.
+    power is in W per metre of wall thickness.
+    """
+    xi = np.asarray(xi, dtype=float)
+    z = np.asarray(z, dtype=float)
+    heights, signs = image_sources(z_source, Lz, periods)
+    Pe = v / (2 * alpha)
+    rise = np.zeros(np.broadcast(xi, z).shape)
+    for zs, sign in zip(heights, signs):
+        r = np.maximum(np.sqrt(xi**2 + (z - zs)**2), 1e-12)
+        x = Pe * r
+        # exp(-Pe xi) K0(Pe r) combined so that large Peclet numbers do not overflow
+        large = x > 2.0
+        term = np.empty(rise.shape)
+        term[large] = np.exp(-Pe * (xi + r))[large] * _k0_large(x[large])
+        term[~large] = np.exp(-Pe * xi)[~large] * bessel_k0(x[~large])
+        rise += sign * term
+    return power / (2 * np.pi * k) * rise
+
+
+def path_history(path, timesteps, dt, power=1.0):
+    """Source history (t, x, z, energy) of a nozzle path given as path(step) -> (x, z)"""
+    steps = np.arange(timesteps)
+    xz = np.array([path(s) for s in steps], dtype=float)
+    return {'t': steps * dt, 'x': xz[:, 0], 'z': xz[:, 1], 'energy': np.full(timesteps, power * dt)}
+
+
+class MovingSourceEstimator:
+    """Superposition of Gaussian line-source Green's functions along a source history.
+
+    history      : dict of arrays t, x, z (source release time and position) and
+                   energy (J per metre of wall thickness), see path_history
+    T0           : background temperature (the bed temperature)
+    Lz           : wall height for the adiabatic-top images (None = semi-infinite)
+    Lx           : domain length for adiabatic side mirrors (None = unbounded)
+    source_sigma : Gaussian radius of a deposited source (m)
+    periods      : number of 4 Lz image periods on each side (0 = bed and top images)
+    max_elements : chunk size of the probes × times × sources evaluation
+    chunk_probes : probes per spatial chunk (sources out of reach are culled per chunk)
+    """
+
+    def __init__(self, history, k=0.25, rho=1200.0, cp=1500.0, T0=60.0, Lz=None, Lx=None,
+                 periods=0, source_sigma=0.00025, max_elements=2_000_000, chunk_probes=64):
+        self.t = np.asarray(history['t'], dtype=float)
+        self.x = np.asarray(history['x'], dtype=float)
+        self.z = np.asarray(history['z'], dtype=float)
+        self.energy = np.asarray(history['energy'], dtype=float)
+        self.k, self.rho_cp = k, rho * cp
+        self.alpha = k / self.rho_cp
+        self.T0 = T0
+        self.Lz, self.Lx, self.periods = Lz, Lx, periods
+        self.sigma2 = source_sigma**2
+        self.max_elements = max_elements
+        self.chunk_probes = chunk_probes
+
+        # Image sources (source index, x, z, sign), built once for the whole history
+        src, xs, zs, signs = [], [], [], []
+        for n in range(len(self.t)):
+            heights, hsigns = image_sources(self.z[n], Lz, periods)
+            mirrors = [self.x[n]] if Lx is None else [self.x[n], -self.x[n], 2*Lx - self.x[n]]
+            for xm in mirrors:
+                src.extend([n] * len(heights))
+                xs.extend([xm] * len(heights))
+                zs.extend(heights)
+                signs.extend(hsigns)
+        self._src = np.array(src)
+        self._xs = np.array(xs)
+        self._zs = np.array(zs)
+        self._weight = np.array(signs) * self.energy[self._src] / (2 * np.pi * self.rho_cp)
+
+    def temperature(self, x, z, t, before=None):
+        """Temperature at probes (x, z) and times t.
+
+        x and z have shape (P,); t is a scalar, shape (P,) or (P, K).
+        Only sources released before min(t, before) contribute - with
+        `before` this is the far-field contribution of old deposits.
+        Returns an array of shape (P,) or (P, K).
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        t = np.asarray(t, dtype=float)
+        squeeze = t.ndim < 2
+        t = np.broadcast_to(t.reshape(-1, 1) if squeeze else t, (len(x), 1 if squeeze else t.shape[1]))
+        cutoff = np.inf if before is None else before
+
+        release = self.t[self._src]
+        active = release < min(cutoff, float(t.max()))
+        xs, zs, weight, release = self._xs[active], self._zs[active], self._weight[active], release[active]
+
+        # Gaussian reach of every source at the latest time (exp(-reach²/2s²) < 1e-8)
+        reach = 6.0 * np.sqrt(self.sigma2 + 2 * self.alpha * np.maximum(float(t.max()) - release, 0.0))
+
+        # Probes are processed in spatially compact chunks (sorted by x); sources
+        # out of reach of a chunk's bounding box are skipped
+        P, K = t.shape
+        out = np.full((P, K), self.T0)
+        order = np.lexsort((z, x))
+        chunk = max(1, min(self.chunk_probes, self.max_elements // max(1, K * len(xs))))
+        for p0 in range(0, P, chunk):
+            idx = order[p0:p0 + chunk]
+            px, pz = x[idx], z[idx]
+            gap_x = np.maximum(0.0, np.maximum(px.min() - xs, xs - px.max()))
+            gap_z = np.maximum(0.0, np.maximum(pz.min() - zs, zs - pz.max()))
+            near = gap_x**2 + gap_z**2 < reach**2
+            if not near.any():
+                continue
+            r2 = ((px[:, None] - xs[near])**2 + (pz[:, None] - zs[near])**2)[:, None, :]
+            tau = t[idx, :, None] - release[near]
+            s2 = self.sigma2 + 2 * self.alpha * np.maximum(tau, 0.0)
+            g = np.where(tau > 0, weight[near] / s2 * np.exp(-r2 / (2 * s2)), 0.0)
+            out[idx] += g.sum(axis=2)
+        return out[:, 0] if squeeze else out
+
+    def field(self, x_nodes, z_nodes, t, before=None):
+        """Temperature on a tensor grid, shape (len(z_nodes), len(x_nodes)).
+
+        Usable as the starting field T of validate_realistic_fff.run_simulation.
+        """
+        X, Z = np.meshgrid(x_nodes, z_nodes)
+        return self.temperature(X.ravel(), Z.ravel(), float(t), before=before).reshape(X.shape)
+
+    def peak_temperature(self, x, z, lags=None, max_passes=2, t_end=None):
+        """Peak temperature and its time at every probe over the whole history.
+
+        Each probe is evaluated at the times the source passes closest to it
+        (local minima of the probe-source distance, nearest `max_passes`)
+        plus a geometric set of lags - the peak at depth d trails the source
+        by roughly d² / (4 alpha). Times are limited to t_end (default: the
+        last source release).
+        Returns (peak, time_of_peak), each of shape (P,).
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        if lags is None:
+            lags = np.concatenate(([0.0], np.geomspace(0.02, 4.0, 9)))
+        lags = np.asarray(lags, dtype=float)
+
+        d2 = (x[:, None] - self.x[None, :])**2 + (z[:, None] - self.z[None, :])**2
+        padded = np.pad(d2, ((0, 0), (1, 1)), constant_values=np.inf)
+        minima = (d2 <= padded[:, :-2]) & (d2 < padded[:, 2:])
+        d2_min = np.where(minima, d2, np.inf)
+        passes = np.argsort(d2_min, axis=1)[:, :max_passes]
+        valid = np.take_along_axis(d2_min, passes, axis=1) < np.inf
+        valid[:, 0] = True
+        base = np.where(valid, self.t[passes], self.t[passes[:, :1]])
+
+        times = (base[:, :, None] + lags[None, None, :]).reshape(len(x), -1)
+        times = np.minimum(times, self.t[-1] if t_end is None else t_end)
+        T = self.temperature(x, z, times)
+        best = np.argmax(T, axis=1)
+        rows = np.arange(len(x))
+        return T[rows, best], times[rows, best]
+
+
+def fit_power(estimator, x, z, t, T_reference):
+    """Scale the source energies so the estimate matches T_reference at (x, z, t).
+
+    The temperature rise is linear in the source strength, so this is a
+    one-parameter least-squares fit. Returns the applied scale factor.
+    """
+    rise = estimator.temperature(x, z, t) - estimator.T0
+    excess = np.asarray(T_reference, dtype=float) - estimator.T0
+    scale = float(np.sum(rise * excess) / np.sum(rise * rise))
+    estimator.energy = estimator.energy * scale
+    estimator._weight = estimator._weight * scale
+    return scale
+
+
+def main():
+    import time
+    import validate_realistic_fff as fom
+
+    timesteps = 300
+    print("Numerical reference (validate_realistic_fff)...")
+    T_hot, *_ = fom.run_simulation(np.full((fom.Nz, fom.Nx), fom.T_init), timesteps, fom.nozzle_temp)
+    T_cold, *_ = fom.run_simulation(np.full((fom.Nz, fom.Nx), fom.T_init), timesteps, fom.T_init)
+    # Nozzle contribution alone: the bed warm-up transient cancels in the difference
+    rise_fd = T_hot - T_cold
+
+    history = path_history(fom.nozzle_position, timesteps, fom.dt)
+    estimator = MovingSourceEstimator(history, k=fom.k, rho=fom.rho, cp=fom.cp, T0=0.0,
+                                      Lz=fom.Lz, Lx=fom.Lx, source_sigma=fom.dx)
+    x_nodes = np.linspace(0, fom.Lx, fom.Nx)
+    z_nodes = np.linspace(0, fom.Lz, fom.Nz)
+    t_end = (timesteps - 1) * fom.dt
+
+    # Fit the source strength on the interface line below the bead
+    z_interface = 0.0015
+    i_interface = int(round(z_interface / fom.dz))
+    probes_x = x_nodes[5:-5]
+    probes_z = np.full_like(probes_x, z_nodes[i_interface])
+    scale = fit_power(estimator, probes_x, probes_z, t_end, rise_fd[i_interface, 5:-5])
+    print(f"  fitted line-source power: {scale:.1f} W/m")
+
+    start = time.perf_counter()
+    rise = estimator.field(x_nodes, z_nodes, t_end)
+    field_time = time.perf_counter() - start
+    far = np.broadcast_to(np.abs(z_nodes[:, None] - 0.002) > 0.0005, rise.shape)
+    print(f"  full-field estimate: {field_time*1e3:.1f} ms, "
+          f"RMS error {np.sqrt(np.mean((rise - rise_fd)**2)):.2f}°C "
+          f"(away from the bead: {np.sqrt(np.mean(((rise - rise_fd)[far])**2)):.2f}°C)")
+
+    start = time.perf_counter()
+    peak, when = estimator.peak_temperature(probes_x, probes_z)
+    peak_time = time.perf_counter() - start
+    print(f"  peak interface rise along the path ({len(probes_x)} probes): "
+          f"max {peak.max():.1f}°C, {peak_time*1e3:.1f} ms")
+
+    v = fom.Lx / (200 * fom.dt)
+    quasi = rosenthal_line(-0.005, z_interface, 0.002, v, scale, fom.k, fom.alpha, Lz=fom.Lz)
+    print(f"  Rosenthal quasi-steady rise 5 mm behind the nozzle at the interface: {quasi:.1f}°C")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Streaming animation export for moving-source FFF runs.
+
+Frames are rendered into one persistent matplotlib figure and piped straight
+to ffmpeg (or ImageMagick for GIFs), so memory use does not grow with the
+number of frames. Works both live from the time loop of
+validate_realistic_fff.py and offline from a stored snapshot history, e.g.
+
+    snapshots = np.load('history.npy', mmap_mode='r')   # (n_frames, Nz, Nx)
+    animate_snapshots('history.mp4', snapshots, Lx=0.05, Lz=0.005)
+"""
+
+import numpy as np
+from matplotlib import animation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+
+
+def _make_writer(path, fps):
+    """Pick a piping (streaming) movie writer for the output file type"""
+    if animation.writers.is_available('ffmpeg'):
+        extra_args = None if path.lower().endswith('.gif') else ['-pix_fmt', 'yuv420p']
+        return animation.FFMpegWriter(fps=fps, extra_args=extra_args)
+    if path.lower().endswith('.gif') and animation.writers.is_available('imagemagick'):
+        return animation.ImageMagickWriter(fps=fps)
+    # PillowWriter keeps every frame in memory, so it is deliberately not used here
+    raise RuntimeError("Streaming animation export needs ffmpeg (or ImageMagick for .gif) on PATH")
+
+
+class SimulationAnimator:
+    """Incrementally encode temperature fields T[z, x] into an MP4/GIF file.
+
+    The colour scale is fixed to [vmin, vmax] for the whole movie, and the
+    nozzle position (meters) is drawn as a marker on every frame.
+    """
+
+    def __init__(self, path, Lx, Lz, vmin=20.0, vmax=90.0, fps=30, dpi=100,
+                 cmap='hot', title='FFF Moving Source'):
+        self.path = path
+        self.Lx = Lx
+        self.Lz = Lz
+        self.title = title
+        self.n_frames = 0
+
+        # Frames are drawn off-screen, independent of the interactive backend
+        self.fig = Figure(figsize=(10, 3))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(111)
+        self.norm = Normalize(vmin=vmin, vmax=vmax)
+        self.image = None
+        self.cmap = cmap
+
+        (self.nozzle_marker,) = self.ax.plot([], [], 'v', color='cyan', markersize=10,
+                                             markeredgecolor='k', label='Nozzle')
+        self.ax.set_xlim(0, Lx * 1000)
+        self.ax.set_ylim(0, Lz * 1000)
+        self.ax.set_xlabel('X position (mm)')
+        self.ax.set_ylabel('Z height (mm)')
+        self.ax.set_title(title)
+
+        self.writer = _make_writer(path, fps)
+        self.writer.setup(self.fig, path, dpi=dpi)
+
+    def add_frame(self, T, nozzle_pos=None, time=None):
+        """Render T (and the nozzle at (x, z) in meters) and stream it to the encoder"""
+        if self.image is None:
+            self.image = self.ax.imshow(T, extent=[0, self.Lx*1000, 0, self.Lz*1000],
+                                        aspect='auto', cmap=self.cmap, norm=self.norm,
+                                        origin='lower')
+            self.fig.colorbar(self.image, ax=self.ax, label='Temperature (°C)')
+        else:
+            self.image.set_data(T)
+
+        if nozzle_pos is not None:
+            self.nozzle_marker.set_data([nozzle_pos[0] * 1000], [nozzle_pos[1] * 1000])
+        if time is not None:
+            self.ax.set_title(f'{self.title}  (t = {time:.2f} s)')
+
+        self.writer.grab_frame()
+        self.n_frames += 1
+
+    def close(self):
+        """Flush and close the encoder"""
+        if self.writer is not None:
+            self.writer.finish()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def animate_snapshots(path, snapshots, Lx, Lz, nozzle_positions=None, times=None, **kwargs):
+    """Encode an iterable of stored fields into an animation, one frame at a time.
+
+    `snapshots` can be any iterable of 2D arrays - a generator, a list, or a
+    memory-mapped (n_frames, Nz, Nx) .npy file - it is never materialized.
+    `nozzle_positions` and `times` are optional per-frame iterables.
+    Returns the number of frames written.
+    """
+    nozzle_iter = iter(nozzle_positions) if nozzle_positions is not None else None
+    time_iter = iter(times) if times is not None else None
+
+    with SimulationAnimator(path, Lx, Lz, **kwargs) as animator:
+        for T in snapshots:
+            nozzle_pos = next(nozzle_iter) if nozzle_iter is not None else None
+            time = next(time_iter) if time_iter is not None else None
+            animator.add_frame(np.asarray(T), nozzle_pos=nozzle_pos, time=time)
+        return animator.n_frames
@@ -0,0 +1,255 @@
+"""
+Calibrate h, alpha and the nozzle blend factor against measured temperatures.
+
+Measurements (thermocouple series or a vertical profile) are loaded from CSV
+and compared with the real moving-nozzle simulation - the same Gaussian
+blend source, implicit Gauss-Seidel diffusion and bed / convection /
+adiabatic boundary conditions as validate_realistic_fff.py - instead of a
+hand-written analytic curve.
+
+The forward model is vectorized over a batch of parameter sets: all
+finite-difference gradient candidates of one Levenberg-Marquardt iteration
+run together as a single (batch, Nz, Nx) simulation, and every result is
+cached so repeated parameter sets (e.g. a rejected LM step) cost nothing.
+
+CSV format (header required, extra columns ignored):
+
+    time,x_mm,z_mm,T          probe series; empty time = end of the run
+"""
+
+import numpy as np
+
+PARAM_NAMES = ('h', 'alpha', 'blend')
+
+
+def load_measurements(path):
+    """Read probe data from CSV into arrays time (s, NaN = final), x, z (m) and T (°C)"""
+    data = np.genfromtxt(path, delimiter=',', names=True, dtype=float)
+    data = np.atleast_1d(data)
+    time = data['time'] if 'time' in data.dtype.names else np.full(data.shape, np.nan)
+    return {
+        'time': np.asarray(time, dtype=float),
+        'x': np.asarray(data['x_mm'], dtype=float) / 1000.0,
+        'z': np.asarray(data['z_mm'], dtype=float) / 1000.0,
+        'T': np.asarray(data['T'], dtype=float),
+    }
+
+
+def zigzag_path(Lx, z_pos, steps_per_pass=200):
+    """Nozzle path of validate_realistic_fff: sweep in x at a fixed height"""
+    def path(step):
+        return (step % steps_per_pass) / steps_per_pass * Lx, z_pos
+    return path
+
+
+class BatchedWallModel:
+    """Moving-nozzle wall simulation evaluated for many (h, alpha, blend) at once.
+
+    Calling the model with a (batch, 3) parameter matrix returns the predicted
+    temperatures at the measurement points, shape (batch, n_measurements).
+    """
+
+    def __init__(self, measurements, Lx=0.05, Lz=0.005, Nx=100, Nz=25, k=0.25,
+                 T_init=20.0, T_bed=60.0, T_inf=20.0, T_nozzle=85.0, dt=0.01,
+                 timesteps=500, path=None, nozzle_radius=0.0004, sweeps=3):
+        self.measurements = measurements
+        self.Lx, self.Lz, self.Nx, self.Nz = Lx, Lz, Nx, Nz
+        self.dx = Lx / (Nx - 1)
+        self.dz = Lz / (Nz - 1)
+        self.k = k
+        self.T_init, self.T_bed, self.T_inf, self.T_nozzle = T_init, T_bed, T_inf, T_nozzle
+        self.dt = dt
+        self.timesteps = timesteps
+        self.path = path if path is not None else zigzag_path(Lx, 0.002)
+        self.nozzle_radius = nozzle_radius
+        self.sweeps = sweeps
+        self.n_runs = 0
+
+        # Record step of every measurement (final time -> last step)
+        times = measurements['time']
+        steps = np.where(np.isnan(times), timesteps - 1,
+                         np.round(np.nan_to_num(times) / dt) - 1).astype(int)
+        self.record_steps = np.clip(steps, 0, timesteps - 1)
+
+        # Bilinear sampling weights of the probes on the node grid
+        fx = np.clip(measurements['x'] / self.dx, 0, Nx - 1 - 1e-9)
+        fz = np.clip(measurements['z'] / self.dz, 0, Nz - 1 - 1e-9)
+        self._j = fx.astype(int)
+        self._i = fz.astype(int)
+        self._wx = fx - self._j
+        self._wz = fz - self._i
+
+        ii, jj = np.indices((Nz - 2, Nx - 2))
+        red = (ii + jj) % 2 == 0
+        self._masks = (red, ~red)
+
+    def _sample(self, T, idx):
+        """Interpolated temperatures of measurements `idx` for every batch member"""
+        i, j, wx, wz = self._i[idx], self._j[idx], self._wx[idx], self._wz[idx]
+        return ((1 - wz) * ((1 - wx) * T[:, i, j] + wx * T[:, i, j + 1]) +
+                wz * ((1 - wx) * T[:, i + 1, j] + wx * T[:, i + 1, j + 1]))
+
+    def _heat_source(self, T, x_pos, z_pos, blend):
+        """Batched Gaussian blend towards T_nozzle (as apply_gaussian_heat_source)"""
+        j = int(x_pos / self.dx)
+        i = int(z_pos / self.dz)
+        if not (0 <= i < self.Nz and 0 <= j < self.Nx):
+            return
+        sigma = max(1, round(self.nozzle_radius / self.dx)) / 2.0
+        i0, i1 = max(0, i - 3), min(self.Nz, i + 4)
+        j0, j1 = max(0, j - 3), min(self.Nx, j + 4)
+        di = np.arange(i0, i1)[:, None] - i
+        dj = np.arange(j0, j1)[None, :] - j
+        weight = np.exp(-(di**2 + dj**2) / (2 * sigma**2))
+        factor = weight[None, :, :] * blend[:, None, None]
+        block = T[:, i0:i1, j0:j1]
+        block += factor * (self.T_nozzle - block)
+
+    def __call__(self, params):
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        B = params.shape[0]
+        h = params[:, 0][:, None]
+        Fo_x = (params[:, 1] * self.dt / self.dx**2)[:, None, None]
+        Fo_z = (params[:, 1] * self.dt / self.dz**2)[:, None, None]
+        blend = params[:, 2]
+        coeff_center = 1 + 2*Fo_x + 2*Fo_z
+
+        T = np.full((B, self.Nz, self.Nx), self.T_init)
+        predictions = np.empty((B, len(self.record_steps)))
+        record_at = {}
+        for n, s in enumerate(self.record_steps):
+            record_at.setdefault(int(s), []).append(n)
+
+        for step in range(self.timesteps):
+            x_pos, z_pos = self.path(step)
+            self._heat_source(T, x_pos, z_pos, blend)
+
+            # Implicit step: red-black Gauss-Seidel sweeps on the interior
+            T_old = T[:, 1:-1, 1:-1].copy()
+            for _ in range(self.sweeps):
+                for mask in self._masks:
+                    update = (Fo_x * (T[:, 1:-1, 2:] + T[:, 1:-1, :-2]) +
+                              Fo_z * (T[:, 2:, 1:-1] + T[:, :-2, 1:-1]) + T_old) / coeff_center
+                    np.copyto(T[:, 1:-1, 1:-1], update, where=mask)
+
+            # Boundary conditions (bed, convective top, adiabatic sides)
+            T[:, 0, :] = self.T_bed
+            T[:, -1, :] = (self.k * T[:, -2, :] / self.dz + h * self.T_inf) / (self.k / self.dz + h)
+            T[:, :, 0] = T[:, :, 1]
+            T[:, :, -1] = T[:, :, -2]
+
+            if step in record_at:
+                idx = record_at[step]
+                predictions[:, idx] = self._sample(T, np.array(idx))
+
+        self.n_runs += B
+        return predictions
+
+
+class CachedModel:
+    """Memoizes model predictions per parameter set (rounded to `digits` significant digits)"""
+
+    def __init__(self, model, digits=10):
+        self.model = model
+        self.digits = digits
+        self.cache = {}
+        self.hits = 0
+
+    def _key(self, p):
+        return tuple(float(f"{v:.{self.digits}g}") for v in p)
+
+    def __call__(self, params):
+        params = np.atleast_2d(params)
+        keys = [self._key(p) for p in params]
+        missing = [n for n, key in enumerate(keys) if key not in self.cache]
+        self.hits += len(keys) - len(missing)
+        if missing:
+            # Only uncached parameter sets go into the batched forward run
+            results = self.model(params[missing])
+            for n, row in zip(missing, results):
+                self.cache[keys[n]] = row
+        return np.array([self.cache[key] for key in keys])
+
+
+def calibrate(model, measured, initial, lower, upper, max_iter=25, fd_step=1e-3,
+              tol=1e-6, damping=1e-2, verbose=True):
+    """Levenberg-Marquardt fit of the model parameters to the measured temperatures.
+
+    Parameters are optimized in log space (all are positive) within
+    [lower, upper]; parameters held on a bound leave the normal equations. Each iteration evaluates the current point and all
+    forward-difference candidates as one batched forward run.
+    Returns a dict with the fitted parameters, RMS residual and run counts;
+    'converged' is False when max_iter ran out and 'at_bounds' lists the
+    parameters that ended on a bound - either makes the fit suspect.
+    """
+    if not 0.0 < damping < 1e8:
+        raise ValueError(f"damping must be in (0, 1e8), got {damping}")
+    cached = model if isinstance(model, CachedModel) else CachedModel(model)
+    lo, hi = np.log(np.asarray(lower, float)), np.log(np.asarray(upper, float))
+    u = np.clip(np.log(np.asarray(initial, float)), lo, hi)
+    n_params = len(u)
+    history = []
+
+    def evaluate(points):
+        return cached(np.exp(points)) - measured[None, :]
+
+    cost = None
+    converged = False
+    for iteration in range(max_iter):
+        # Current point + one forward-difference candidate per parameter, batched
+        candidates = np.repeat(u[None, :], n_params + 1, axis=0)
+        steps = np.where(u + fd_step <= hi, fd_step, -fd_step)
+        candidates[1:][np.diag_indices(n_params)] += steps
+        residuals = evaluate(candidates)
+        r = residuals[0]
+        J = (residuals[1:] - r[None, :]).T / steps[None, :]
+        cost = float(r @ r)
+        history.append((np.exp(u), np.sqrt(cost / len(r))))
+        if verbose:
+            values = ', '.join(f"{name}={v:.4g}" for name, v in zip(PARAM_NAMES, np.exp(u)))
+            print(f"  iter {iteration:2d}: RMS = {np.sqrt(cost / len(r)):7.3f}°C  ({values})")
+
+        # Damped Gauss-Newton step on the free parameters; increase damping until
+        # the cost decreases. Parameters on a bound whose gradient points out of
+        # the box are held there (active set), so they do not cut the step short.
+        JTJ = J.T @ J
+        g = J.T @ r
+        active = ((u <= lo + 1e-12) & (g > 0)) | ((u >= hi - 1e-12) & (g < 0))
+        free = ~active
+        if not free.any():
+            converged = True        # stationary on the bounds
+            break
+        JTJ_free = JTJ[np.ix_(free, free)]
+        improved = False
+        while damping < 1e8:
+            delta = np.zeros(n_params)
+            delta[free] = -np.linalg.solve(JTJ_free + damping * np.diag(np.diag(JTJ_free) + 1e-12),
+                                           g[free])
+            u_new = np.clip(u + delta, lo, hi)
+            r_new = evaluate(u_new[None, :])[0]
+            if r_new @ r_new < cost:
+                improved = True
+                damping = max(damping / 3.0, 1e-7)
+                break
+            damping *= 4.0
+        if not improved or np.max(np.abs(u_new - u)) < tol:
+            # No further decrease possible, or the step has become negligible
+            if improved:
+                u = u_new
+            converged = True
+            break
+        u = u_new
+
+    r = evaluate(u[None, :])[0]
+    on_bound = np.isclose(u, lo, rtol=0.0, atol=1e-9) | np.isclose(u, hi, rtol=0.0, atol=1e-9)
+    return {
+        'params': {name: float(v) for name, v in zip(PARAM_NAMES, np.exp(u))},
+        'rms': float(np.sqrt(np.mean(r**2))),
+        'residuals': r,
+        'iterations': len(history),
+        'converged': converged,
+        'at_bounds': [name for name, b in zip(PARAM_NAMES, on_bound) if b],
+        'forward_runs': getattr(cached.model, 'n_runs', None),
+        'cache_hits': cached.hits,
+        'history': history,
+    }
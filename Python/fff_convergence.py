@@ -0,0 +1,160 @@
+"""
+Low-overhead steady-state detection for the time loops.
+
+The scripts used to evaluate `np.max(np.abs(T - T_old))` on every step, which
+allocates a full temporary and costs about as much as the update itself.
+ConvergenceMonitor keeps the same definition of steady state
+(max per-step change < tol) but
+
+  * only checks every K steps (or adaptively, denser near the predicted
+    crossing), so the reported steady time is late by at most `time_tol`,
+  * reduces in place into a preallocated work buffer (no temporaries),
+  * fits the exponential decay max_change ~ A*exp(-lambda*t) to predict the
+    steady-state time and can optionally stop early once that prediction
+    is confident.
+
+Usage:
+
+    monitor = ConvergenceMonitor(tol, dt, check_every=20, adaptive=True)
+    while t < t_end:
+        monitor.before_step(step, T)       # snapshots T only before check steps
+        ... update T ...
+        if monitor.after_step(step, t, T):
+            break
+    monitor.steady_time, monitor.predicted_steady_time
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+class ConvergenceMonitor:
+    """Strided / adaptive steady-state check with time-to-steady extrapolation.
+
+    tol            : steady state when max |T - T_old| over one step < tol
+    dt             : time step (s), used to turn time tolerances into strides
+    check_every    : maximum number of steps between checks
+    time_tol       : optional bound (s) on how late the reported steady time
+                     may be; caps check_every at 1 + time_tol/dt
+    adaptive       : shrink the stride as the predicted crossing approaches
+    early_stop     : stop as soon as the extrapolated steady time is confident
+    fit_window     : number of recent checks used for the exponential fit
+    min_r2         : goodness of fit required for a confident prediction
+    prediction_rtol: consecutive predictions must agree within this fraction
+    """
+
+    def __init__(self, tol, dt, check_every=1, time_tol=None, adaptive=False,
+                 early_stop=False, fit_window=8, min_r2=0.999, prediction_rtol=0.01):
+        self.tol = tol
+        self.dt = dt
+        if time_tol is not None:
+            check_every = min(check_every, 1 + int(time_tol / dt))
+        self.check_every = max(1, int(check_every))
+        self.adaptive = adaptive
+        self.early_stop = early_stop
+        self.min_r2 = min_r2
+        self.prediction_rtol = prediction_rtol
+
+        self.max_change = math.inf
+        self.steady_time = None
+        self.predicted_steady_time = None
+        self.extrapolated = False
+        self.converged = False
+        self.n_checks = 0
+        self._r2 = 0.0
+
+        self._history = deque(maxlen=max(3, fit_window))
+        self._predictions = deque(maxlen=3)
+        self._next_check = 0
+        self._snapshot = None
+        self._work = None
+
+    def is_check_step(self, step):
+        """True if the change over this step will be measured"""
+        return step >= self._next_check
+
+    def before_step(self, step, T):
+        """Copy T into the reusable snapshot buffer if this step will be checked"""
+        if step >= self._next_check:
+            if self._snapshot is None or self._snapshot.shape != T.shape:
+                self._snapshot = np.empty_like(T)
+            np.copyto(self._snapshot, T)
+
+    def _measure(self, T, T_old):
+        """max |T - T_old| via a fused in-place reduction into the work buffer"""
+        if self._work is None or self._work.shape != T.shape:
+            self._work = np.empty_like(T)
+        np.subtract(T, T_old, out=self._work)
+        np.abs(self._work, out=self._work)
+        return float(self._work.max())
+
+    def after_step(self, step, t, T, T_old=None):
+        """Measure the step's change if due; return True when the loop should stop.
+
+        Pass T_old when the caller already keeps the previous field (e.g. for
+        an explicit update) - then before_step() is not needed.
+        """
+        if step < self._next_check:
+            return False
+        if T_old is None:
+            T_old = self._snapshot
+
+        self.max_change = self._measure(T, T_old)
+        self.n_checks += 1
+
+        if self.max_change < self.tol:
+            self.steady_time = t
+            self.converged = True
+            return True
+
+        self._update_prediction(t)
+        if self.early_stop and self.prediction_confident():
+            self.steady_time = float(self.predicted_steady_time)
+            self.extrapolated = True
+            return True
+
+        self._next_check = step + self._stride(t)
+        return False
+
+    def _update_prediction(self, t):
+        """Least-squares fit of log(max_change) vs t over the recent checks"""
+        if self.max_change <= 0.0:
+            return
+        self._history.append((t, math.log(self.max_change)))
+        if len(self._history) < 3:
+            return
+
+        ts = np.array([p[0] for p in self._history])
+        logs = np.array([p[1] for p in self._history])
+        slope, intercept = np.polyfit(ts, logs, 1)
+        if slope >= 0.0:
+            # Not (yet) decaying - no meaningful prediction
+            self.predicted_steady_time = None
+            self._predictions.clear()
+            self._r2 = 0.0
+            return
+
+        residual = logs - (slope * ts + intercept)
+        spread = np.sum((logs - logs.mean())**2)
+        self._r2 = 1.0 - np.sum(residual**2) / spread if spread > 0 else 1.0
+        self.predicted_steady_time = float((math.log(self.tol) - intercept) / slope)
+        self._predictions.append(self.predicted_steady_time)
+
+    def prediction_confident(self):
+        """True when the exponential fit is good and its predictions have settled"""
+        if self.predicted_steady_time is None or len(self._predictions) < self._predictions.maxlen:
+            return False
+        if self._r2 < self.min_r2:
+            return False
+        spread = max(self._predictions) - min(self._predictions)
+        return spread <= self.prediction_rtol * abs(self.predicted_steady_time)
+
+    def _stride(self, t):
+        """Steps until the next check"""
+        if not self.adaptive or self.predicted_steady_time is None:
+            return self.check_every
+        steps_left = (self.predicted_steady_time - t) / self.dt
+        # Halve the distance to the predicted crossing, never exceeding check_every
+        return int(min(self.check_every, max(1, steps_left // 2)))
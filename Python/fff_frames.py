@@ -0,0 +1,173 @@
+"""
+Compact binary frame export for the HTML viewers.
+
+Aufgabe_2_wall_heat_analysis.html and Aufgabe_3_fff_moving_source.html can
+play back runs computed here instead of re-simulating in JavaScript. Frames
+are written while the simulation runs (FrameExporter has the same add_frame
+hook as fff_animation.SimulationAnimator) into one .fffb file:
+
+    'FFFB'                magic
+    uint32                length of the JSON header
+    JSON header           Nx, Nz, Lx, Lz, encoding, offset, scale, delta, ...
+    per frame:
+      uint32 payload length, float32 time, float32 nozzle x, float32 nozzle z,
+      uint8 flags (1 = keyframe, 2 = nozzle position valid)
+      zlib payload        Nz × Nx uint16 words, row 0 = bed (z = 0)
+
+All numbers are little-endian. Values are either quantized
+(encoding 'uint16': T = offset + scale * q) or IEEE half floats
+('float16'). With delta coding every non-key frame stores the difference to
+the previous frame (uint16: modulo 2^16, float16: XOR of the bit patterns),
+which is exact. The words are byte-shuffled (all low bytes, then all high
+bytes) before zlib. The reader for the pages is HTML/fff_frames.js.
+"""
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'FFFB'
+VERSION = 1
+_RECORD = struct.Struct('<IfffB')
+KEYFRAME = 1
+HAS_NOZZLE = 2
+
+
+def _shuffle(words):
+    raw = words.view(np.uint8).reshape(-1, 2)
+    return np.concatenate((raw[:, 0], raw[:, 1])).tobytes()
+
+
+def _unshuffle(data, n):
+    raw = np.frombuffer(data, dtype=np.uint8)
+    return np.stack((raw[:n], raw[n:]), axis=1).ravel().view('<u2')
+
+
+class FrameExporter:
+    """Stream temperature fields T[z, x] into a compact .fffb file.
+
+    encoding       : 'uint16' (quantized to [T_min, T_max]) or 'float16'
+    delta          : store differences to the previous frame
+    keyframe_every : full frame every N frames (for seeking)
+    flip_z         : set when the last row of T is the bed (mesh_convergence_study)
+    """
+
+    def __init__(self, path, Lx, Lz, encoding='uint16', T_min=0.0, T_max=250.0, delta=True,
+                 keyframe_every=50, level=6, flip_z=False, title='', meta=None):
+        if encoding not in ('uint16', 'float16'):
+            raise ValueError(f"Unknown encoding '{encoding}'")
+        self.path = path
+        self.Lx, self.Lz = Lx, Lz
+        self.encoding = encoding
+        self.T_min, self.T_max = T_min, T_max
+        self.scale = (T_max - T_min) / 65535.0
+        self.delta = delta
+        self.keyframe_every = keyframe_every
+        self.level = level
+        self.flip_z = flip_z
+        self.title = title
+        self.meta = meta or {}
+        self.n_frames = 0
+        self.bytes_raw = 0
+        self._previous = None
+        self._file = None
+
+    def _open(self, shape):
+        Nz, Nx = shape
+        header = json.dumps({
+            'version': VERSION, 'Nx': Nx, 'Nz': Nz, 'Lx': self.Lx, 'Lz': self.Lz,
+            'encoding': self.encoding, 'offset': self.T_min, 'scale': self.scale,
+            'delta': self.delta, 'shuffle': True, 'keyframe_every': self.keyframe_every,
+            'units': 'degC', 'title': self.title, 'meta': self.meta,
+        }).encode('utf-8')
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def _encode(self, T):
+        if self.encoding == 'uint16':
+            q = np.rint((T - self.T_min) / self.scale)
+            return np.clip(q, 0, 65535).astype('<u2').ravel()
+        return T.astype('<f2').ravel().view('<u2')
+
+    def add_frame(self, T, nozzle_pos=None, time=None):
+        """Append one frame (nozzle position in meters, time in seconds)"""
+        T = np.asarray(T, dtype=float)
+        if self.flip_z:
+            T = T[::-1]
+        if self._file is None:
+            self._open(T.shape)
+        words = self._encode(T)
+
+        keyframe = not self.delta or self._previous is None or self.n_frames % self.keyframe_every == 0
+        if keyframe:
+            stored = words
+        elif self.encoding == 'uint16':
+            stored = words - self._previous            # wraps modulo 2^16
+        else:
+            stored = words ^ self._previous
+        self._previous = words
+
+        payload = zlib.compress(_shuffle(stored), self.level)
+        flags = (KEYFRAME if keyframe else 0) | (HAS_NOZZLE if nozzle_pos is not None else 0)
+        x_pos, z_pos = nozzle_pos if nozzle_pos is not None else (0.0, 0.0)
+        self._file.write(_RECORD.pack(len(payload), time if time is not None else self.n_frames,
+                                      x_pos, z_pos, flags))
+        self._file.write(payload)
+        self.n_frames += 1
+        self.bytes_raw += T.size * 8
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_frames(path):
+    """Decode a .fffb file; returns (header, frames (n, Nz, Nx), times, nozzle positions)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a .fffb frame file")
+    (length,) = struct.unpack_from('<I', data, 4)
+    header = json.loads(data[8:8 + length].decode('utf-8'))
+    Nz, Nx = header['Nz'], header['Nx']
+    pos = 8 + length
+
+    frames, times, nozzle = [], [], []
+    words = None
+    while pos < len(data):
+        size, t, x_pos, z_pos, flags = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        stored = _unshuffle(zlib.decompress(data[pos:pos + size]), Nz * Nx)
+        pos += size
+        if flags & KEYFRAME:
+            words = stored.copy()
+        elif header['encoding'] == 'uint16':
+            words = words + stored
+        else:
+            words = words ^ stored
+        if header['encoding'] == 'uint16':
+            field = header['offset'] + header['scale'] * words.astype(float)
+        else:
+            field = words.view('<f2').astype(float)
+        frames.append(field.reshape(Nz, Nx))
+        times.append(t)
+        nozzle.append((x_pos, z_pos) if flags & HAS_NOZZLE else None)
+    return header, np.array(frames), np.array(times), nozzle
+
+
+def export_snapshots(path, snapshots, Lx, Lz, nozzle_positions=None, times=None, **kwargs):
+    """Write a stored snapshot history (n_frames, Nz, Nx) to a .fffb file"""
+    with FrameExporter(path, Lx, Lz, **kwargs) as exporter:
+        for n, T in enumerate(snapshots):
+            exporter.add_frame(T, None if nozzle_positions is None else nozzle_positions[n],
+                               None if times is None else times[n])
+    return exporter
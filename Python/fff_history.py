@@ -0,0 +1,379 @@
+"""
+Streaming per-cell / per-bead thermal-history reducers.
+
+Part quality depends on reductions over the whole temperature history -
+peak temperature, time above the glass transition, the interlayer interface
+temperature when a bead is reheated and the cooling rate right after
+deposition. ThermalHistory updates these in place every time step with
+vectorized NumPy operations, so memory stays O(cells) however long the run
+is. It plugs into validate_realistic_fff.run_simulation(history=...).
+
+ThermalHistory tracks the shared deposition state:
+
+  deposit_time  first time each cell was inside the nozzle footprint (NaN before)
+  bead          bead (pass) index of that first deposit (-1 before). A new
+                bead starts whenever the nozzle jumps by more than `bead_jump`
+  pass cells    footprint cells the current pass reaches for the first time -
+                fresh material on them, also where earlier passes deposited
+  reheat        cells last covered by an earlier pass at least
+                `min_reheat_gap` s ago that are in or up to `interface_depth`
+                below the current footprint (once per pass)
+
+and passes it to the reducers. Work outside the full-field maximum and
+accumulation is confined to the footprint and to small queues of pending
+windows. maps() returns every statistic as an (Nz, Nx) array and
+bead_table() aggregates them per bead of first deposit. When passes retrace
+earlier ones (validate_realistic_fff's path re-deposits at the same
+height every pass) only the first pass owns cells, so pass_table()
+attributes every event - deposit, reheat, cooling - to the pass that
+caused it instead.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class Reducer:
+    """Base class: start(shape) once, update(T, time, dt, history) every step,
+    finish() when the run ends, then maps().
+
+    Reducers also aggregate per pass with _add_to_pass(); pass_stats()
+    returns {statistic name: {pass: (sum, count, max)}}. Subclasses that
+    override start() must call super().start(shape).
+    """
+
+    name = 'reducer'
+
+    def start(self, shape):
+        self._pass_stats = {}
+
+    def _add_to_pass(self, name, pass_index, values):
+        stats = self._pass_stats.setdefault(name, {})
+        total, count, high = stats.get(pass_index, (0.0, 0, -np.inf))
+        if values.size:
+            stats[pass_index] = (total + float(values.sum()), count + values.size,
+                                 max(high, float(values.max())))
+
+    def pass_stats(self):
+        return self._pass_stats
+
+    def update(self, T, time, dt, history):
+        raise NotImplementedError
+
+    def finish(self):
+        """Flush windows still open when the run ends"""
+        pass
+
+    def maps(self):
+        return {}
+
+
+class PeakTemperature(Reducer):
+    """Highest temperature every cell has reached"""
+
+    name = 'peak'
+
+    def start(self, shape):
+        super().start(shape)
+        self.peak = np.full(shape, -np.inf)
+
+    def update(self, T, time, dt, history):
+        np.maximum(self.peak, T, out=self.peak)
+        if history.footprint_mask is not None:
+            self._add_to_pass('Footprint temperature (°C)', history.pass_index,
+                              T[history.footprint_slice][history.footprint_mask])
+
+    def maps(self):
+        return {'Peak temperature (°C)': self.peak}
+
+
+class TimeAbove(Reducer):
+    """Accumulated time above a threshold (default: PLA glass transition)"""
+
+    name = 'time_above'
+
+    def __init__(self, threshold=60.0):
+        self.threshold = threshold
+
+    def start(self, shape):
+        super().start(shape)
+        self.time_above = np.zeros(shape)
+        self._hot = np.empty(shape, dtype=bool)
+
+    def update(self, T, time, dt, history):
+        np.greater(T, self.threshold, out=self._hot)
+        np.add(self.time_above, dt, out=self.time_above, where=self._hot)
+
+    def maps(self):
+        return {f'Time above {self.threshold:g}°C (s)': self.time_above}
+
+
+class CoolingRateAtDeposition(Reducer):
+    """Mean cooling rate over `window` s, starting `delay` s after deposition.
+
+    The delay lets the nozzle pass (its footprint keeps heating the fresh
+    bead for a few steps); the rate is positive for cooling. Every pass
+    over a cell is a deposit; the map keeps the latest rate.
+    """
+
+    name = 'cooling_rate'
+
+    def __init__(self, delay=0.05, window=0.25):
+        self.delay = delay
+        self.window = window
+
+    def start(self, shape):
+        super().start(shape)
+        self.rate = np.full(shape, np.nan)
+        self._starts = deque()    # (due time, slice, mask, pass) waiting for the start sample
+        self._ends = deque()      # (due time, slice, mask, pass, start sample) waiting for the end
+
+    def update(self, T, time, dt, history):
+        if history.pass_mask is not None:
+            self._starts.append((history.time + self.delay, history.pass_slice, history.pass_mask,
+                                 history.pass_index))
+        while self._starts and self._starts[0][0] <= time + 1e-12:
+            _, sl, mask, pass_index = self._starts.popleft()
+            self._ends.append((time + self.window, sl, mask, pass_index, T[sl][mask]))
+        while self._ends and self._ends[0][0] <= time + 1e-12:
+            _, sl, mask, pass_index, T_start = self._ends.popleft()
+            rate = (T_start - T[sl][mask]) / self.window
+            self.rate[sl][mask] = rate
+            self._add_to_pass('Cooling rate after deposition (°C/s)', pass_index, rate)
+
+    def maps(self):
+        return {'Cooling rate after deposition (°C/s)': self.rate}
+
+
+class InterfaceReheat(Reducer):
+    """Interface temperature when a deposited cell is first reheated by a later pass.
+
+    onset: temperature at the step the reheat starts; peak: highest
+    temperature within `window` s after that. The maps keep the first
+    reheat of each cell, the pass statistics every reheat.
+    """
+
+    name = 'interface_reheat'
+
+    def __init__(self, window=0.3):
+        self.window = window
+
+    def start(self, shape):
+        super().start(shape)
+        self.onset = np.full(shape, np.nan)
+        self.peak = np.full(shape, np.nan)
+        self._active = deque()    # (end time, slice, mask, first-reheat mask, pass, peak so far)
+
+    def update(self, T, time, dt, history):
+        if history.reheat_mask is not None:
+            sl, mask = history.reheat_slice, history.reheat_mask
+            onset = T[sl][mask]
+            first = np.isnan(self.onset[sl][mask])
+            self.onset[sl][mask] = np.where(first, onset, self.onset[sl][mask])
+            self._add_to_pass('Interface temperature at reheat (°C)', history.pass_index, onset)
+            self._active.append((time + self.window, sl, mask, first, history.pass_index, onset.copy()))
+        while self._active and self._active[0][0] < time - 1e-12:
+            _, sl, mask, first, pass_index, peak = self._active.popleft()
+            self._add_to_pass('Interface peak during reheat (°C)', pass_index, peak)
+        for _, sl, mask, first, _, peak in self._active:
+            np.maximum(peak, T[sl][mask], out=peak)
+            cells = self.peak[sl]
+            cells[mask] = np.where(first, peak, cells[mask])
+
+    def finish(self):
+        """Reheats in the last `window` s count with the peak reached so far"""
+        while self._active:
+            _, sl, mask, first, pass_index, peak = self._active.popleft()
+            self._add_to_pass('Interface peak during reheat (°C)', pass_index, peak)
+
+    def maps(self):
+        return {'Interface temperature at reheat (°C)': self.onset,
+                'Interface peak during reheat (°C)': self.peak}
+
+
+def default_reducers(Tg=60.0):
+    return [PeakTemperature(), TimeAbove(Tg), InterfaceReheat(), CoolingRateAtDeposition()]
+
+
+class ThermalHistory:
+    """Deposition tracking plus a set of streaming reducers on an (Nz, Nx) grid."""
+
+    def __init__(self, shape, dx, dz, nozzle_radius=0.0004, reducers=None, bead_jump=None,
+                 min_reheat_gap=0.5, interface_depth=None):
+        self.shape = shape
+        self.dx, self.dz = dx, dz
+        self.radius = nozzle_radius
+        self.reducers = reducers if reducers is not None else default_reducers()
+        self.bead_jump = bead_jump if bead_jump is not None else 4 * nozzle_radius
+        self.min_reheat_gap = min_reheat_gap
+        self.interface_depth = interface_depth if interface_depth is not None else nozzle_radius
+
+        self.deposit_time = np.full(shape, np.nan)
+        self.bead = np.full(shape, -1, dtype=int)
+        self.reheat_time = np.full(shape, np.nan)
+        self.covered_time = np.full(shape, np.nan)     # when the last pass over the cell reached it
+        self.covered_pass = np.full(shape, -1, dtype=int)
+        self.reheat_pass = np.full(shape, -1, dtype=int)
+        self.pass_cells = []                           # cells reached per pass
+        self.n_beads = 0
+        self.time = 0.0
+        self._last_nozzle = None
+        self.new_slice = self.new_mask = None
+        self.pass_slice = self.pass_mask = None
+        self.footprint_slice = self.footprint_mask = None
+        self.reheat_slice = self.reheat_mask = None
+        self.finished = False
+        for reducer in self.reducers:
+            reducer.start(shape)
+
+    @property
+    def pass_index(self):
+        """Index of the current pass (bead)"""
+        return self.n_beads - 1
+
+    def _window(self, x_pos, z_low, z_high):
+        """Node slice covering x ± radius and z in [z_low, z_high], with node coordinates"""
+        Nz, Nx = self.shape
+        j0 = max(0, int(np.ceil((x_pos - self.radius) / self.dx)))
+        j1 = min(Nx, int(np.floor((x_pos + self.radius) / self.dx)) + 1)
+        i0 = max(0, int(np.ceil(z_low / self.dz)))
+        i1 = min(Nz, int(np.floor(z_high / self.dz)) + 1)
+        z = (np.arange(i0, i1) * self.dz)[:, None]
+        x = (np.arange(j0, j1) * self.dx)[None, :]
+        return np.s_[i0:i1, j0:j1], x, z
+
+    def update(self, T, time, nozzle_pos, dt):
+        """Advance all statistics by one step of length dt ending at `time`"""
+        if self.finished:
+            raise RuntimeError("ThermalHistory.update() called after finish()")
+        self.time = time
+        self.new_mask = self.pass_mask = self.footprint_mask = self.reheat_mask = None
+        if nozzle_pos is not None:
+            x_pos, z_pos = nozzle_pos
+            if (self._last_nozzle is None or
+                    np.hypot(x_pos - self._last_nozzle[0], z_pos - self._last_nozzle[1]) > self.bead_jump):
+                self.n_beads += 1
+                self.pass_cells.append(0)
+            self._last_nozzle = (x_pos, z_pos)
+            current = self.pass_index
+
+            # Reheat: cells an earlier pass covered, in or just below the footprint, once per pass
+            sl, x, z = self._window(x_pos, z_pos - self.radius - self.interface_depth, z_pos + self.radius)
+            reheat = (np.abs(x - x_pos) <= self.radius) & (self.reheat_pass[sl] != current)
+            reheat &= self.covered_pass[sl] < current
+            reheat &= time - self.covered_time[sl] >= self.min_reheat_gap    # NaN compares False
+            if reheat.any():
+                first = reheat & np.isnan(self.reheat_time[sl])
+                self.reheat_time[sl][first] = time
+                self.reheat_pass[sl][reheat] = current
+                self.reheat_slice, self.reheat_mask = sl, reheat
+
+            # Deposit: footprint cells this pass reaches for the first time
+            sl, x, z = self._window(x_pos, z_pos - self.radius, z_pos + self.radius)
+            footprint = (x - x_pos)**2 + (z - z_pos)**2 <= self.radius**2
+            self.footprint_slice, self.footprint_mask = sl, footprint
+            reached = footprint & (self.covered_pass[sl] != current)
+            if reached.any():
+                self.covered_pass[sl][reached] = current
+                self.covered_time[sl][reached] = time
+                self.pass_cells[current] += int(reached.sum())
+                self.pass_slice, self.pass_mask = sl, reached
+            new = footprint & np.isnan(self.deposit_time[sl])
+            if new.any():
+                self.deposit_time[sl][new] = time
+                self.bead[sl][new] = current
+                self.new_slice, self.new_mask = sl, new
+
+        for reducer in self.reducers:
+            reducer.update(T, time, dt, self)
+
+    def finish(self):
+        """End the run: reducers flush their open windows. Called by maps()
+        and pass_table(); no update() is allowed afterwards"""
+        if not self.finished:
+            for reducer in self.reducers:
+                reducer.finish()
+            self.finished = True
+
+    def maps(self):
+        """All statistics as (Nz, Nx) arrays, keyed by a readable name"""
+        self.finish()
+        maps = {'Deposition time (s)': self.deposit_time}
+        for reducer in self.reducers:
+            maps.update(reducer.maps())
+        return maps
+
+    def pass_table(self):
+        """Per-pass statistics of the events each pass caused: cells reached,
+        footprint temperature, cooling after deposition and interface reheat
+        (mean and max over the event cells)"""
+        self.finish()
+        rows = [{'Pass': n, 'Cells': cells} for n, cells in enumerate(self.pass_cells)]
+        for reducer in self.reducers:
+            for name, per_pass in reducer.pass_stats().items():
+                for row in rows:
+                    total, count, high = per_pass.get(row['Pass'], (0.0, 0, np.nan))
+                    row[f'Mean {name}'] = total / count if count else np.nan
+                    row[f'Max {name}'] = high if count else np.nan
+        return rows
+
+    def bead_table(self):
+        """Per-bead mean (and max) of every statistic over the cells the bead deposited first"""
+        cells = self.bead >= 0
+        beads = self.bead[cells]
+        n = self.n_beads
+        counts = np.bincount(beads, minlength=n)
+        rows = [{'Bead': b, 'Cells': int(counts[b])} for b in range(n) if counts[b]]
+        for name, values in self.maps().items():
+            v = values[cells]
+            valid = np.isfinite(v)
+            total = np.bincount(beads[valid], weights=v[valid], minlength=n)
+            count = np.bincount(beads[valid], minlength=n)
+            high = np.full(n, -np.inf)
+            np.maximum.at(high, beads[valid], v[valid])
+            for row in rows:
+                b = row['Bead']
+                row[f'Mean {name}'] = total[b] / count[b] if count[b] else np.nan
+                if name != 'Deposition time (s)':
+                    row[f'Max {name}'] = high[b] if count[b] else np.nan
+        return rows
+
+
+def plot_maps(history, Lx, Lz, path='fff_thermal_history.png'):
+    """Save all history maps as one figure"""
+    import matplotlib.pyplot as plt
+
+    maps = history.maps()
+    fig, axes = plt.subplots(len(maps), 1, figsize=(12, 2.2 * len(maps)), squeeze=False)
+    for ax, (name, values) in zip(axes[:, 0], maps.items()):
+        im = ax.imshow(np.where(np.isfinite(values), values, np.nan), origin='lower', aspect='auto',
+                       extent=[0, Lx*1000, 0, Lz*1000], cmap='inferno')
+        ax.set_title(name)
+        ax.set_ylabel('Z (mm)')
+        fig.colorbar(im, ax=ax)
+    axes[-1, 0].set_xlabel('X position (mm)')
+    fig.tight_layout()
+    fig.savefig(path, dpi=120, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def main():
+    import pandas as pd
+    import validate_realistic_fff as fom
+
+    history = ThermalHistory((fom.Nz, fom.Nx), fom.dx, fom.dz, fom.nozzle_radius)
+    T = np.ones((fom.Nz, fom.Nx)) * fom.T_init
+    fom.run_simulation(T, 500, fom.nozzle_temp, history=history)
+
+    # The path retraces the same height every pass, so the first bead owns
+    # all cells; the pass table attributes later deposits and reheats too
+    table = pd.DataFrame(history.pass_table())
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(table.round(2).to_string(index=False))
+    print(f"\n✓ Maps saved to '{plot_maps(history, fom.Lx, fom.Lz)}'")
+
+
+if __name__ == '__main__':
+    main()
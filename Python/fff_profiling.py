@@ -0,0 +1,211 @@
+"""
+Lightweight instrumentation for the solver time loops.
+
+Provides named phase timers, counters (sweeps, steps, allocated bytes, ...)
+and user callbacks fired every N steps. With trace_allocations every phase
+also records the heap memory it allocates (tracemalloc). Results go to a
+JSONL stream and/or an in-memory summary. A disabled profiler (or NULL_PROFILER) turns every call
+into a no-op, so the hooks can stay in the loop permanently:
+
+    profiler = SolverProfiler(jsonl_path='run_profile.jsonl')
+    profiler.add_callback(print_progress, every=50)
+    while time < t_end:
+        with profiler.phase('diffusion'):
+            ...
+        profiler.count('sweeps', 50)
+        profiler.step(step, time, max_change=max_change)
+    print(profiler.report())
+"""
+
+import json
+import time as _time
+import tracemalloc
+from contextlib import nullcontext
+
+_NULL_PHASE = nullcontext()
+
+
+class _PhaseTimer:
+    """Reusable context manager accumulating wall time for one named phase"""
+    __slots__ = ('totals', 'calls', 'name', 'start')
+
+    def __init__(self, totals, calls, name):
+        self.totals = totals
+        self.calls = calls
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = _time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.totals[self.name] += _time.perf_counter() - self.start
+        self.calls[self.name] += 1
+        return False
+
+
+class _TracedPhaseTimer(_PhaseTimer):
+    """Phase timer that also measures heap allocations with tracemalloc.
+
+    Per call, the peak traced memory above the level at entry is the most
+    the phase held at once (temporaries included). Phases must not nest,
+    because entering one resets the tracemalloc peak.
+    """
+    __slots__ = ('profiler', 'base')
+
+    def __init__(self, totals, calls, name, profiler):
+        super().__init__(totals, calls, name)
+        self.profiler = profiler
+        self.base = 0
+
+    def __enter__(self):
+        self.base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        peak = tracemalloc.get_traced_memory()[1] - self.base
+        profiler = self.profiler
+        profiler.alloc_totals[self.name] = profiler.alloc_totals.get(self.name, 0) + peak
+        profiler.alloc_peaks[self.name] = max(profiler.alloc_peaks.get(self.name, 0), peak)
+        profiler.counters['allocated_bytes'] = profiler.counters.get('allocated_bytes', 0) + peak
+        return False
+
+
+def print_progress(step, time, values):
+    """Default progress callback, e.g. 't = 5.0 s, max_change = 1.23e-02'"""
+    fields = ', '.join(f"{name} = {value:.2e}" for name, value in values.items())
+    print(f"t = {time:.1f} s, {fields}" if fields else f"t = {time:.1f} s")
+
+
+class SolverProfiler:
+    """Phase timers, counters and periodic callbacks for a time-stepping loop.
+
+    enabled    : if False every method returns immediately
+    jsonl_path : optional file receiving one JSON record per logged step
+                 plus a final summary record
+    log_every  : write a JSONL step record every N steps
+    trace_allocations : measure heap allocations per phase with tracemalloc
+                 (peak bytes per call; adds noticeable overhead)
+    """
+
+    def __init__(self, enabled=True, jsonl_path=None, log_every=1, trace_allocations=False):
+        self.enabled = enabled
+        self.trace_allocations = enabled and trace_allocations
+        self.alloc_totals = {}
+        self.alloc_peaks = {}
+        self._started_tracing = False
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.log_every = max(1, int(log_every))
+        self.phase_totals = {}
+        self.phase_calls = {}
+        self.counters = {}
+        self.callbacks = []
+        self._timers = {}
+        self._logged_totals = {}
+        self._wall_start = _time.perf_counter()
+        self._stream = open(jsonl_path, 'w', encoding='utf-8') if (enabled and jsonl_path) else None
+
+    # --- hooks used inside the loop -------------------------------------
+    def phase(self, name):
+        """Context manager timing one occurrence of a named phase"""
+        if not self.enabled:
+            return _NULL_PHASE
+        timer = self._timers.get(name)
+        if timer is None:
+            self.phase_totals[name] = 0.0
+            self.phase_calls[name] = 0
+            if self.trace_allocations:
+                timer = _TracedPhaseTimer(self.phase_totals, self.phase_calls, name, self)
+            else:
+                timer = _PhaseTimer(self.phase_totals, self.phase_calls, name)
+            self._timers[name] = timer
+        return timer
+
+    def count(self, name, n=1):
+        """Increment a named counter (sweeps, ...)"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_callback(self, callback, every=1):
+        """Call callback(step, time, values) every `every` steps"""
+        self.callbacks.append((max(1, int(every)), callback))
+
+    def step(self, step, time, **values):
+        """Mark the end of a timestep; fires callbacks and writes JSONL records"""
+        if not self.enabled:
+            return
+        self.counters['steps'] = self.counters.get('steps', 0) + 1
+
+        for every, callback in self.callbacks:
+            if step % every == 0:
+                callback(step, time, values)
+
+        if self._stream is not None and step % self.log_every == 0:
+            # Phase times are reported as increments since the previous record
+            phases = {name: total - self._logged_totals.get(name, 0.0)
+                      for name, total in self.phase_totals.items()}
+            self._logged_totals = dict(self.phase_totals)
+            record = {'event': 'step', 'step': step, 'time': time,
+                      'phases': phases, **{k: float(v) for k, v in values.items()}}
+            self._stream.write(json.dumps(record) + '\n')
+
+    # --- results ----------------------------------------------------------
+    def summary(self):
+        """In-memory summary: per-phase totals/fractions, counters and wall time"""
+        wall = _time.perf_counter() - self._wall_start
+        timed = sum(self.phase_totals.values())
+        phases = {}
+        for name, total in self.phase_totals.items():
+            calls = self.phase_calls[name]
+            phases[name] = {
+                'total_s': total,
+                'calls': calls,
+                'mean_ms': 1000.0 * total / calls if calls else 0.0,
+                'fraction': total / timed if timed > 0 else 0.0,
+            }
+            if self.trace_allocations:
+                phases[name]['alloc_mean_kb'] = self.alloc_totals.get(name, 0) / calls / 1024 if calls else 0.0
+                phases[name]['alloc_peak_kb'] = self.alloc_peaks.get(name, 0) / 1024
+        return {'wall_s': wall, 'phases': phases, 'counters': dict(self.counters)}
+
+    def report(self):
+        """Human-readable table of the summary"""
+        if not self.enabled:
+            return "Profiling disabled"
+        s = self.summary()
+        alloc = self.trace_allocations
+        lines = [f"{'Phase':<16}{'Total (s)':>12}{'Calls':>10}{'Mean (ms)':>12}{'Share':>9}"
+                 + (f"{'Alloc/call (KB)':>17}{'Peak (KB)':>11}" if alloc else '')]
+        for name, p in sorted(s['phases'].items(), key=lambda item: -item[1]['total_s']):
+            lines.append(f"{name:<16}{p['total_s']:>12.3f}{p['calls']:>10d}"
+                         f"{p['mean_ms']:>12.3f}{p['fraction']*100:>8.1f}%"
+                         + (f"{p['alloc_mean_kb']:>17.1f}{p['alloc_peak_kb']:>11.1f}" if alloc else ''))
+        lines.append(f"Wall time: {s['wall_s']:.3f} s")
+        lines.append("Counters: " + ', '.join(f"{k}={v}" for k, v in s['counters'].items()))
+        return '\n'.join(lines)
+
+    def close(self):
+        """Write the summary record, close the JSONL stream and stop our tracemalloc session"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._stream is not None:
+            self._stream.write(json.dumps({'event': 'summary', **self.summary()}) + '\n')
+            self._stream.close()
+            self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+# Shared disabled instance used as the default by the solver loops
+NULL_PROFILER = SolverProfiler(enabled=False)
@@ -1,11 +1,22 @@
 import numpy as np
 import time
 import pandas as pd
+from fff_convergence import ConvergenceMonitor
+from fff_mesh import GradedGrid, boundary_gradient, geometric_nodes, tanh_nodes, uniform_nodes
 
 def run_simulation(Nx=100, Nz=10, bed_temp=60.0, ambient_temp=20.0,
                    Lx=0.05, Lz=0.005, alpha=1.37e-7, max_time=200.0,
-                   tol=1e-6):
-    """Run heat diffusion simulation and return steady-state metrics"""
+                   tol=1e-6, check_every=1, steady_time_tol=None, early_stop=False,
+                   animator=None, frame_interval=1.0):
+    """Run heat diffusion simulation and return steady-state metrics
+
+    The steady-state check runs every `check_every` steps (adaptively refined
+    near the predicted crossing), so the reported steady time is late by at
+    most `steady_time_tol` seconds. With early_stop the run ends once the
+    extrapolated steady time is confident.
+    If an animator (e.g. fff_frames.FrameExporter with flip_z=True) is given,
+    the field is streamed to it every `frame_interval` seconds.
+    """
     
     dx = Lx / (Nx - 1)
     dz = Lz / (Nz - 1)
@@ -30,7 +41,10 @@ def run_simulation(Nx=100, Nz=10, bed_temp=60.0, ambient_temp=20.0,
     temps = []
     t = 0.0
     it = 0
+    last_frame = 0.0
     steady_t = None
+    monitor = ConvergenceMonitor(tol, dt, check_every=check_every, time_tol=steady_time_tol,
+                                 adaptive=check_every > 1, early_stop=early_stop)
     
     start_wall = time.time()
     
@@ -50,16 +64,18 @@ def run_simulation(Nx=100, Nz=10, bed_temp=60.0, ambient_temp=20.0,
         T[:, 0] = ambient_temp
         T[:, -1] = ambient_temp
 
-        max_change = np.max(np.abs(T - Tn))
-
         # Record data every 1.0s
         if len(times) == 0 or t - times[-1] >= 1.0:
             times.append(t)
             temps.append(T[iz, ix])
 
+        if animator is not None and (it == 0 or t - last_frame >= frame_interval - 1e-12):
+            animator.add_frame(T, time=t)
+            last_frame = t
+
         # Check for steady state
-        if max_change < tol:
-            steady_t = t
+        if monitor.after_step(it, t, T, T_old=Tn):
+            steady_t = monitor.steady_time
             break
 
         t += dt
@@ -69,21 +85,104 @@ def run_simulation(Nx=100, Nz=10, bed_temp=60.0, ambient_temp=20.0,
     
     # Calculate temperature gradient at steady state
     gradient = (T[-1, ix] - T[0, ix]) / (Lz * 1000)  # °C/mm
+    bed_gradient, mean_bed_gradient = bed_gradients(T, uniform_nodes(Lx, Nx), uniform_nodes(Lz, Nz), ix)
     
-    # Check convergence (small change in last step)
-    converged = max_change < tol
+    # Check convergence (small change in last checked step)
+    max_change = monitor.max_change
+    converged = monitor.converged
     
     return {
         'Mesh Size': f'{Nx}×{Nz}',
         'Grid Points': Nx * Nz,
         'Steady Time (s)': round(steady_t, 1) if steady_t else '>200',
         'Gradient (°C/mm)': round(abs(gradient), 1),
+        'Bed Gradient (°C/mm)': round(bed_gradient, 2),
+        'Mean Bed Gradient (°C/mm)': round(mean_bed_gradient, 2),
         'Max Change': f'{max_change:.3e}',
         'Wall Time (s)': round(elapsed, 2),
         'Converged': '✅' if converged else '⚠️' if steady_t else '❌'
     }
 
 
+def bed_gradients(T, x, z, ix):
+    """|dT/dz| at the bed (last row) at column ix and averaged over x, in °C/mm"""
+    distance_from_bed = z[-1] - z[::-1]
+    gradient = np.abs(boundary_gradient(distance_from_bed, T[::-1, :])) / 1000
+    return gradient[ix], np.trapezoid(gradient, x) / (x[-1] - x[0])
+
+
+def run_graded_simulation(x_nodes, z_nodes, bed_temp=60.0, ambient_temp=20.0,
+                          alpha=1.37e-7, max_time=200.0, tol=1e-6, label=None,
+                          check_every=50, steady_time_tol=0.05, return_field=False):
+    """Same problem and metrics as run_simulation on a graded (non-uniform) mesh
+
+    Uses the variable-spacing explicit stencil of fff_mesh.GradedGrid; with
+    uniform nodes it reproduces run_simulation. Clustered meshes need a
+    smaller stable dt, so `tol` is applied per 1 ms of simulated time (the
+    step used by run_simulation) to keep the same steady-state definition.
+    With return_field the result is (metrics, grid, final field).
+    """
+    grid = GradedGrid(x_nodes, z_nodes)
+    Nz, Nx = grid.shape
+    Lz = grid.Lz
+
+    dt = min(grid.stable_dt(alpha), 0.001)
+
+    T = np.ones((Nz, Nx)) * ambient_temp
+    T[-1, :] = bed_temp
+    T[:, 0] = ambient_temp
+    T[:, -1] = ambient_temp
+
+    ix = int(np.argmin(np.abs(grid.x - 0.5 * grid.Lx)))
+    t = 0.0
+    it = 0
+    steady_t = None
+    monitor = ConvergenceMonitor(tol * dt / 0.001, dt, check_every=check_every,
+                                 time_tol=steady_time_tol, adaptive=check_every > 1)
+    T_next = np.empty_like(T)
+
+    start_wall = time.time()
+
+    while t < max_time:
+        # Explicit update on the graded stencil; Dirichlet boundaries are carried over
+        grid.explicit_step(T, alpha, dt, out=T_next)
+        T, T_next = T_next, T
+
+        if monitor.after_step(it, t, T, T_old=T_next):
+            steady_t = monitor.steady_time
+            break
+
+        t += dt
+        it += 1
+
+    elapsed = time.time() - start_wall
+
+    gradient = (T[-1, ix] - T[0, ix]) / (Lz * 1000)  # °C/mm
+    bed_gradient, mean_bed_gradient = bed_gradients(T, grid.x, grid.z, ix)
+    max_change = monitor.max_change
+
+    result = {
+        'Mesh Size': label or f'{Nx}×{Nz}',
+        'Grid Points': Nx * Nz,
+        'Steady Time (s)': round(steady_t, 1) if steady_t else f'>{max_time:g}',
+        'Gradient (°C/mm)': round(abs(gradient), 1),
+        'Bed Gradient (°C/mm)': round(bed_gradient, 2),
+        'Mean Bed Gradient (°C/mm)': round(mean_bed_gradient, 2),
+        'Max Change': f'{max_change:.3e}',
+        'Wall Time (s)': round(elapsed, 2),
+        'Converged': '✅' if monitor.converged else '❌'
+    }
+    return (result, grid, T) if return_field else result
+
+
+def field_error(grid, T, ref_grid, T_ref):
+    """RMS and max |T - T_ref| on the interior reference nodes, T interpolated bilinearly"""
+    rows = np.array([np.interp(ref_grid.x, grid.x, row) for row in T])
+    T_on_ref = np.array([np.interp(ref_grid.z, grid.z, col) for col in rows.T]).T
+    error = (T_on_ref - T_ref)[1:-1, 1:-1]
+    return float(np.sqrt(np.mean(error**2))), float(np.max(np.abs(error)))
+
+
 def main():
     print("=" * 100)
     print("MESH CONVERGENCE ANALYSIS".center(100))
@@ -105,7 +204,8 @@ def main():
         
         result = run_simulation(Nx=Nx, Nz=Nz, bed_temp=60.0, ambient_temp=20.0,
                                Lx=0.05, Lz=0.005, alpha=1.37e-7, 
-                               max_time=500.0, tol=1e-6)
+                               max_time=500.0, tol=1e-6,
+                               check_every=50, steady_time_tol=0.05)
         results.append(result)
         
         print(f"✅ Steady State: {result['Steady Time (s)']}s | Gradient: {result['Gradient (°C/mm)']}°C/mm | {result['Converged']}")
@@ -168,6 +268,60 @@ def main():
     
     print()
     print("=" * 100)
+    print("GRADED MESH COMPARISON".center(100))
+    print("=" * 100)
+    print()
+
+    # Clustered towards the bed/top (z) and the bed-wall corners (x), each against a
+    # uniform mesh with the same number of points. The centre gradient is the
+    # same on every mesh (the field is nearly linear in z there), so meshes are
+    # compared by their field error against the uniform 500×50 solution.
+    graded_meshes = [
+        ('tanh 100×20', tanh_nodes(0.05, 100, beta=3.0), tanh_nodes(0.005, 20, beta=1.5)),
+        ('tanh 100×20 mild', tanh_nodes(0.05, 100, beta=2.5), tanh_nodes(0.005, 20, beta=1.2)),
+        ('geometric 80×20', geometric_nodes(0.05, 80, 1.15, 'both'), geometric_nodes(0.005, 20, 1.15, 'both')),
+    ]
+    settings = dict(bed_temp=60.0, ambient_temp=20.0, alpha=1.37e-7, max_time=500.0, tol=1e-6,
+                    return_field=True)
+
+    print("Running reference: uniform 500×50 on the same stencil...", end=' ', flush=True)
+    reference, ref_grid, T_ref = run_graded_simulation(uniform_nodes(0.05, 500), uniform_nodes(0.005, 50),
+                                                       label='uniform 500×50', **settings)
+    print(f"✅ Steady State: {reference['Steady Time (s)']}s")
+
+    graded_results = []
+    for label, x_nodes, z_nodes in graded_meshes:
+        uniform_label = f"uniform {len(x_nodes)}×{len(z_nodes)}"
+        for name, xs, zs in ((label, x_nodes, z_nodes),
+                             (uniform_label, uniform_nodes(0.05, len(x_nodes)), uniform_nodes(0.005, len(z_nodes)))):
+            if any(r['Mesh Size'] == name for r in graded_results):
+                continue
+            print(f"Running simulation: {name}...", end=' ', flush=True)
+            result, grid, T = run_graded_simulation(xs, zs, label=name, **settings)
+            rms, worst = field_error(grid, T, ref_grid, T_ref)
+            result['RMS Error (°C)'] = round(rms, 4)
+            result['Max Error (°C)'] = round(worst, 3)
+            graded_results.append(result)
+            print(f"✅ Steady State: {result['Steady Time (s)']}s | RMS error vs 500×50: {rms:.4f}°C")
+
+    columns = ['Mesh Size', 'Grid Points', 'Steady Time (s)', 'RMS Error (°C)', 'Max Error (°C)',
+               'Bed Gradient (°C/mm)', 'Mean Bed Gradient (°C/mm)']
+    print()
+    print(pd.DataFrame(graded_results)[columns].to_string(index=False))
+    print()
+    by_name = {r['Mesh Size']: r for r in graded_results}
+    print(f"Field error against uniform 500×50 ({reference['Grid Points']:,} points), "
+          f"graded vs uniform with the same points:")
+    for label, x_nodes, z_nodes in graded_meshes:
+        graded = by_name[label]
+        uniform = by_name[f"uniform {len(x_nodes)}×{len(z_nodes)}"]
+        print(f"  {label:<18} {graded['Grid Points'] / reference['Grid Points'] * 100:4.1f}% of the cells: "
+              f"RMS {graded['RMS Error (°C)']:.4f}°C vs {uniform['RMS Error (°C)']:.4f}°C, "
+              f"max {graded['Max Error (°C)']:.2f}°C vs {uniform['Max Error (°C)']:.2f}°C")
+    print("  (The errors concentrate at the bed/side-wall corners, where the bed and side")
+    print("   temperatures meet; the mean bed gradient keeps growing as they are resolved.)")
+    print()
+    print("=" * 100)
 
 
 if __name__ == '__main__':
@@ -7,9 +7,12 @@ Tests that:
 4. Gaussian heat distribution works correctly
 """
 
+from contextlib import ExitStack
+
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
+from fff_profiling import NULL_PROFILER
 
 # Physical parameters (matching HTML)
 Lx = 0.05          # 50mm domain length
@@ -33,9 +36,6 @@ h = 15.0           # Convection coefficient
 dt = 0.01          # REDUCED timestep for stability (was 0.05)
 nozzle_radius = 0.0004  # 0.4mm
 
-# Initialize temperature field
-T = np.ones((Nz, Nx)) * T_init
-
 # Simulate realistic nozzle path (moving in X, depositing layers)
 # Simulate realistic nozzle path (moving in X, depositing layers)
 def apply_gaussian_heat_source(T, x_pos, z_pos, T_nozzle, dx, dz, nozzle_radius=0.0004):
@@ -95,121 +95,327 @@ def solve_heat_equation_step(T, alpha, dx, dz, dt):
     return T
 
 # Simulate nozzle pass with new heat source
-print("=" * 70)
-print("FFF SIMULATION REALISTIC TEMPERATURE VALIDATION")
-print("=" * 70)
-
 # Nozzle travel across domain
 nozzle_temp = 85.0  # Cooled filament (not raw nozzle)
 timesteps = 500
 layer_1_time = 150  # Apply heat for first 150 steps
 
-max_temps = []
-mean_temps = []
-times = []
+# Optional temperature-dependent properties (e.g. fff_materials.pla_properties())
+material = None
+
+# Optional animation export (e.g. 'fff_moving_source.mp4' or '.gif', needs ffmpeg)
+animation_path = None
+frame_every = 5     # Write one animation frame every N timesteps
+
+# Optional frame export for the HTML viewers (e.g. 'fff_moving_source.fffb', see fff_frames);
+# can be combined with animation_path
+frames_path = None
+
+# Multirate stepping (fff_multirate): large steps of multirate_ratio * dt, small steps near the nozzle
+multirate_ratio = None
+
+# Phase timers and counters (see fff_profiling); profile_path also streams per-step JSONL records
+profile = False
+profile_path = None
+profile_allocations = False     # per-phase heap allocations via tracemalloc (slower)
+
+# Graded mesh: z nodes clustered around the nozzle track height (fff_mesh.clustered_nodes);
+# not with animation_path / frames_path, which assume uniform spacing
+graded_mesh = False
 
-print(f"\nSimulation Parameters:")
-print(f"  Domain: {Lx*1000:.1f}mm × {Lz*1000:.1f}mm (Grid: {Nx}×{Nz})")
-print(f"  Nozzle temperature (cooled filament): {nozzle_temp}°C")
-print(f"  Bed temperature: {T_bed}°C")
-print(f"  Convection h: {h:.1f} W/m²K")
-print(f"  Nozzle radius: {nozzle_radius*1000:.2f}mm")
-print(f"\nRunning {timesteps} timesteps (dt={dt}s)...\n")
+# Per-cell and per-pass thermal-history statistics (peak T, time above Tg, ...), see fff_history
+track_history = False
 
-for step in range(timesteps):
-    # Move nozzle continuously (zigzag pattern)
+
+class FrameSinks:
+    """Forward every add_frame call to several frame sinks (animator, exporter)"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def add_frame(self, T, nozzle_pos=None, time=None):
+        for sink in self.sinks:
+            sink.add_frame(T, nozzle_pos=nozzle_pos, time=time)
+
+
+def nozzle_position(step):
+    """Nozzle (x, z) position in meters at a given timestep (zigzag pass)"""
     nozzle_distance = (step % 200) / 200.0 * Lx  # Traverse back and forth
-    
-    # Apply heat source continuously
-    x_pos = nozzle_distance
-    z_pos = 0.002  # Fixed height above bed (depositing filament)
-    T_before = np.max(T)
-    T = apply_gaussian_heat_source(T, x_pos, z_pos, nozzle_temp, dx, dz, nozzle_radius)
-    T_after = np.max(T)
-    
-    if step == 0:
-        print(f"\nDEBUG: Continuous nozzle motion starting:")
-    
-    # Solve heat equation
-    T = solve_heat_equation_step(T, alpha, dx, dz, dt)
-    
-    # Apply boundary conditions
-    T = apply_boundary_conditions(T, T_bed, T_inf, h, k, dz)
-    
-    # Record statistics
-    max_temps.append(np.max(T))
-    mean_temps.append(np.mean(T))
-    times.append(step * dt)
-    
-    if (step + 1) % 100 == 0:
-        print(f"  Step {step+1:3d}: Max temp = {np.max(T):6.2f}°C, "
-              f"Mean = {np.mean(T):5.2f}°C, Range = [{np.min(T):5.1f}, {np.max(T):6.2f}]°C")
-
-print(f"\nFinal Temperature Field Statistics:")
-print(f"  Max temperature: {np.max(T):.2f}°C")
-print(f"  Min temperature: {np.min(T):.2f}°C")
-print(f"  Mean temperature: {np.mean(T):.2f}°C")
-print(f"  Bed center temp: {T[0, Nx//2]:.2f}°C")
-print(f"  Top center temp: {T[-1, Nx//2]:.2f}°C")
-
-# Check realism
-print("\nVALIDATION CHECKS:")
-max_temp = np.max(T)
-if max_temp <= 90:  # Allow slight overshoot from 85°C
-    print(f"  OK: Maximum temperature {max_temp:.2f}C is realistic (<=90C)")
-else:
-    print(f"  PROBLEM: Maximum temperature {max_temp:.2f}C is too high!")
-
-if abs(T[0, Nx//2] - T_bed) < 2:
-    print(f"  OK: Bed maintains ~{T_bed}C")
-else:
-    print(f"  PROBLEM: Bed temperature drift: {T[0, Nx//2]:.2f}C vs {T_bed}C")
-
-if T[-1, Nx//2] < 40:
-    print(f"  OK: Top surface cools appropriately ({T[-1, Nx//2]:.2f}C)")
-else:
-    print(f"  PROBLEM: Top surface too warm ({T[-1, Nx//2]:.2f}C)")
-
-# Visualize
-fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-
-# Plot 1: Final temperature heatmap
-im = axes[0, 0].imshow(T, extent=[0, Lx*1000, 0, Lz*1000], aspect='auto', 
-                        cmap='hot', vmin=20, vmax=90, origin='lower')
-axes[0, 0].set_xlabel('X position (mm)')
-axes[0, 0].set_ylabel('Z height (mm)')
-axes[0, 0].set_title('Final Temperature Distribution')
-plt.colorbar(im, ax=axes[0, 0], label='Temperature (°C)')
-
-# Plot 2: Temperature vs time
-axes[0, 1].plot(times, max_temps, 'r-', label='Max temp', linewidth=2)
-axes[0, 1].plot(times, mean_temps, 'b-', label='Mean temp', linewidth=2)
-axes[0, 1].axhline(y=85, color='orange', linestyle='--', label='Nozzle/Filament temp', linewidth=1.5)
-axes[0, 1].axhline(y=T_bed, color='green', linestyle='--', label='Bed temp', linewidth=1.5)
-axes[0, 1].set_xlabel('Time (s)')
-axes[0, 1].set_ylabel('Temperature (°C)')
-axes[0, 1].set_title('Temperature Evolution')
-axes[0, 1].legend()
-axes[0, 1].grid(True, alpha=0.3)
-
-# Plot 3: Vertical temperature profile
-center_j = Nx // 2
-axes[1, 0].plot(T[:, center_j], np.linspace(0, Lz*1000, Nz), 'b-', linewidth=2)
-axes[1, 0].set_xlabel('Temperature (°C)')
-axes[1, 0].set_ylabel('Z height (mm)')
-axes[1, 0].set_title('Vertical Temperature Profile (Center X)')
-axes[1, 0].grid(True, alpha=0.3)
-axes[1, 0].invert_yaxis()
-
-# Plot 4: Horizontal temperature profile
-center_i = Nz // 2
-axes[1, 1].plot(np.linspace(0, Lx*1000, Nx), T[center_i, :], 'r-', linewidth=2)
-axes[1, 1].set_xlabel('X position (mm)')
-axes[1, 1].set_ylabel('Temperature (°C)')
-axes[1, 1].set_title(f'Horizontal Temperature Profile (Z = {Lz*1000/2:.2f}mm)')
-axes[1, 1].grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('fff_realistic_validation.png', dpi=150, bbox_inches='tight')
-print(f"\n✓ Visualization saved to 'fff_realistic_validation.png'")
-plt.show()
+    return nozzle_distance, 0.002  # Fixed height above bed (depositing filament)
+
+
+def run_simulation(T, timesteps=500, nozzle_temp=85.0, animator=None, frame_every=1,
+                   profiler=NULL_PROFILER, material=None, T_bed=T_bed, h=h, fast_solver=False,
+                   history=None, grid=None, multirate=None):
+    """Run the moving-nozzle time loop on T and return (T, times, max_temps, mean_temps).
+
+    If an animator (see fff_animation.SimulationAnimator) is given, one frame is
+    streamed to it every `frame_every` steps - nothing is kept in memory.
+    Phase timings and counters go to `profiler` (see fff_profiling.SolverProfiler).
+    With a `material` (see fff_materials) k(T) and cp(T) are used through the
+    lagged-coefficient ImplicitHeatStepper instead of the constant-alpha solver.
+    T_bed and h default to the module settings.
+    fast_solver replaces the Gauss-Seidel sweeps by an exact backward-Euler
+    step of fff_poisson (constant properties only).
+    A `history` (see fff_history.ThermalHistory) is updated every step with the
+    per-cell thermal-history statistics.
+    With a `grid` (fff_mesh.GradedGrid of shape T.shape) the implicit step
+    uses its variable-spacing stencil and the nozzle stamp its node
+    coordinates; the uniform-grid options (material, fast_solver, history,
+    animator) are rejected.
+    A `multirate` stepper (fff_multirate.MultirateStepper for this mesh)
+    advances `ratio` steps per iteration: a large global step plus small
+    steps near the nozzle. Statistics, frames and the profiler then see
+    every ratio-th step; history, material, fast_solver and grid are
+    rejected.
+    """
+    if material is not None and fast_solver:
+        raise ValueError("fast_solver supports constant properties only, not a material")
+    if grid is not None and (material is not None or fast_solver or history is not None):
+        raise ValueError("grid supports constant properties and the Gauss-Seidel step only")
+    if grid is not None and animator is not None:
+        # Animation and .fffb frames place the nodes uniformly over Lx x Lz
+        raise ValueError("frame sinks assume a uniform grid and cannot show a graded one")
+    if multirate is not None:
+        if material is not None or fast_solver or grid is not None or history is not None:
+            raise ValueError("multirate supports constant properties on the uniform grid only, "
+                             "without history")
+        if timesteps % multirate.ratio:
+            raise ValueError(f"timesteps={timesteps} is not a multiple of ratio={multirate.ratio}")
+        if multirate.h != h or (multirate.Nz, multirate.Nx) != T.shape:
+            raise ValueError("multirate stepper was built for a different mesh or h")
+    stepper = None
+    dz_top = dz if grid is None else grid.z[-1] - grid.z[-2]
+    if material is not None:
+        from fff_materials import ImplicitHeatStepper
+        stepper = ImplicitHeatStepper(material, dx, dz)
+    elif fast_solver:
+        from fff_poisson import poisson_solver
+        solver = poisson_solver(Nx, Nz, dx, dz, alpha, k, h)
+
+    max_temps = []
+    mean_temps = []
+    times = []
+
+    def heat_source(T, x_pos, z_pos):
+        apply_gaussian_heat_source(T, x_pos, z_pos, nozzle_temp, dx, dz, nozzle_radius)
+
+    m = multirate.ratio if multirate is not None else 1
+    for step in range(0, timesteps, m):
+        last = step + m - 1     # step whose end state this iteration produces
+        x_pos, z_pos = nozzle_position(last)
+
+        # Apply heat source continuously (the multirate stepper applies it per small step)
+        if multirate is None:
+            with profiler.phase('heat_source'):
+                if grid is not None:
+                    T = grid.apply_heat_source(T, x_pos, z_pos, nozzle_temp, nozzle_radius)
+                else:
+                    T = apply_gaussian_heat_source(T, x_pos, z_pos, nozzle_temp, dx, dz, nozzle_radius)
+
+        if step == 0:
+            print(f"\nDEBUG: Continuous nozzle motion starting:")
+
+        # Solve heat equation
+        with profiler.phase('diffusion'):
+            if multirate is not None:
+                sweeps = multirate.sweeps
+                T = multirate.macro_step(T, step, nozzle_position, heat_source, T_bed, T_inf)
+                profiler.count('sweeps', multirate.sweeps - sweeps)
+            elif stepper is not None:
+                T = stepper.step(T, dt)
+                profiler.count('sweeps', 3)
+            elif fast_solver:
+                T = solver.step(T, dt, T_bed, T_inf)
+            elif grid is not None:
+                T = grid.implicit_step(T, alpha, dt, sweeps=3)
+                profiler.count('sweeps', 3)
+            else:
+                T = solve_heat_equation_step(T, alpha, dx, dz, dt)
+                profiler.count('sweeps', 3)
+
+        # Apply boundary conditions
+        with profiler.phase('boundary'):
+            k_top = k if material is None else material.k(T[-2, :])
+            T = apply_boundary_conditions(T, T_bed, T_inf, h, k_top, dz_top)
+
+        # Record statistics
+        with profiler.phase('statistics'):
+            max_temps.append(np.max(T))
+            mean_temps.append(np.mean(T))
+            times.append(last * dt)
+
+        if history is not None:
+            with profiler.phase('history'):
+                history.update(T, step * dt, (x_pos, z_pos), dt)
+
+        if animator is not None and last // frame_every != (step - 1) // frame_every:
+            with profiler.phase('animation'):
+                animator.add_frame(T, nozzle_pos=(x_pos, z_pos), time=last * dt)
+
+        profiler.step(last, last * dt)
+
+        if (last + 1) // 100 != step // 100:
+            print(f"  Step {last+1:3d}: Max temp = {np.max(T):6.2f}°C, "
+                  f"Mean = {np.mean(T):5.2f}°C, Range = [{np.min(T):5.1f}, {np.max(T):6.2f}]°C")
+
+    return T, times, max_temps, mean_temps
+
+
+def main():
+    print("=" * 70)
+    print("FFF SIMULATION REALISTIC TEMPERATURE VALIDATION")
+    print("=" * 70)
+
+    print(f"\nSimulation Parameters:")
+    print(f"  Domain: {Lx*1000:.1f}mm × {Lz*1000:.1f}mm (Grid: {Nx}×{Nz})")
+    print(f"  Nozzle temperature (cooled filament): {nozzle_temp}°C")
+    print(f"  Bed temperature: {T_bed}°C")
+    print(f"  Convection h: {h:.1f} W/m²K")
+    print(f"  Nozzle radius: {nozzle_radius*1000:.2f}mm")
+    print(f"\nRunning {timesteps} timesteps (dt={dt}s)...\n")
+
+    # Initialize temperature field
+    T = np.ones((Nz, Nx)) * T_init
+
+    if graded_mesh and (animation_path is not None or frames_path is not None):
+        raise ValueError("graded_mesh cannot be combined with animation_path or frames_path "
+                         "(both assume uniform spacing)")
+
+    grid = None
+    x_nodes, z_nodes = np.linspace(0, Lx, Nx), np.linspace(0, Lz, Nz)
+    if graded_mesh:
+        from fff_mesh import GradedGrid, clustered_nodes
+        z_track = nozzle_position(0)[1]
+        grid = GradedGrid(x_nodes, clustered_nodes(Lz, Nz, z_track, nozzle_radius))
+        z_nodes = grid.z
+        print(f"Graded mesh: dz from {np.diff(grid.z).min()*1e6:.0f} µm at the track "
+              f"to {np.diff(grid.z).max()*1e6:.0f} µm\n")
+
+    profiler = NULL_PROFILER
+    if profile or profile_path is not None:
+        from fff_profiling import SolverProfiler
+        profiler = SolverProfiler(jsonl_path=profile_path, trace_allocations=profile_allocations)
+
+    multirate = None
+    if multirate_ratio is not None:
+        from fff_multirate import MultirateStepper
+        multirate = MultirateStepper(Nx, Nz, dx, dz, alpha, k, h, dt, ratio=multirate_ratio)
+
+    history = None
+    if track_history:
+        from fff_history import ThermalHistory
+        history = ThermalHistory((Nz, Nx), dx, dz, nozzle_radius)
+
+    # Frame sinks: animation and/or .fffb export, both fed from the same run
+    with ExitStack() as stack:
+        sinks = []
+        if animation_path is not None:
+            from fff_animation import SimulationAnimator
+            sinks.append(stack.enter_context(SimulationAnimator(animation_path, Lx, Lz, vmin=20, vmax=90)))
+        if frames_path is not None:
+            from fff_frames import FrameExporter
+            exporter = stack.enter_context(FrameExporter(frames_path, Lx, Lz, title='FFF moving source'))
+            sinks.append(exporter)
+        animator = None if not sinks else sinks[0] if len(sinks) == 1 else FrameSinks(sinks)
+        T, times, max_temps, mean_temps = run_simulation(
+            T, timesteps, nozzle_temp, animator=animator, frame_every=frame_every,
+            material=material, history=history, grid=grid, profiler=profiler,
+            multirate=multirate)
+    if animation_path is not None:
+        print(f"\n✓ Animation saved to '{animation_path}'")
+    if frames_path is not None:
+        print(f"\n✓ {exporter.n_frames} frames saved to '{frames_path}'")
+
+    if profiler is not NULL_PROFILER:
+        profiler.close()
+        print(f"\nSolver profile:\n{profiler.report()}")
+        if profile_path is not None:
+            print(f"✓ Per-step profile saved to '{profile_path}'")
+
+    if history is not None:
+        from fff_history import plot_maps
+        print(f"\nPer-pass thermal history:")
+        for row in history.pass_table():
+            print(f"  Pass {row['Pass']}: {row['Cells']} cells, "
+                  f"footprint peak {row['Max Footprint temperature (°C)']:.1f}°C, "
+                  f"cooling {row['Mean Cooling rate after deposition (°C/s)']:.1f}°C/s, "
+                  f"interface at reheat {row['Mean Interface temperature at reheat (°C)']:.1f}°C")
+        print(f"✓ History maps saved to '{plot_maps(history, Lx, Lz)}'")
+
+    print(f"\nFinal Temperature Field Statistics:")
+    print(f"  Max temperature: {np.max(T):.2f}°C")
+    print(f"  Min temperature: {np.min(T):.2f}°C")
+    print(f"  Mean temperature: {np.mean(T):.2f}°C")
+    print(f"  Bed center temp: {T[0, Nx//2]:.2f}°C")
+    print(f"  Top center temp: {T[-1, Nx//2]:.2f}°C")
+
+    # Check realism
+    print("\nVALIDATION CHECKS:")
+    max_temp = np.max(T)
+    if max_temp <= 90:  # Allow slight overshoot from 85°C
+        print(f"  OK: Maximum temperature {max_temp:.2f}C is realistic (<=90C)")
+    else:
+        print(f"  PROBLEM: Maximum temperature {max_temp:.2f}C is too high!")
+
+    if abs(T[0, Nx//2] - T_bed) < 2:
+        print(f"  OK: Bed maintains ~{T_bed}C")
+    else:
+        print(f"  PROBLEM: Bed temperature drift: {T[0, Nx//2]:.2f}C vs {T_bed}C")
+
+    if T[-1, Nx//2] < 40:
+        print(f"  OK: Top surface cools appropriately ({T[-1, Nx//2]:.2f}C)")
+    else:
+        print(f"  PROBLEM: Top surface too warm ({T[-1, Nx//2]:.2f}C)")
+
+    # Visualize
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+
+    # Plot 1: Final temperature heatmap
+    if grid is None:
+        im = axes[0, 0].imshow(T, extent=[0, Lx*1000, 0, Lz*1000], aspect='auto', 
+                                cmap='hot', vmin=20, vmax=90, origin='lower')
+    else:
+        im = axes[0, 0].pcolormesh(x_nodes*1000, z_nodes*1000, T, cmap='hot', vmin=20, vmax=90,
+                                   shading='gouraud')
+    axes[0, 0].set_xlabel('X position (mm)')
+    axes[0, 0].set_ylabel('Z height (mm)')
+    axes[0, 0].set_title('Final Temperature Distribution')
+    plt.colorbar(im, ax=axes[0, 0], label='Temperature (°C)')
+
+    # Plot 2: Temperature vs time
+    axes[0, 1].plot(times, max_temps, 'r-', label='Max temp', linewidth=2)
+    axes[0, 1].plot(times, mean_temps, 'b-', label='Mean temp', linewidth=2)
+    axes[0, 1].axhline(y=85, color='orange', linestyle='--', label='Nozzle/Filament temp', linewidth=1.5)
+    axes[0, 1].axhline(y=T_bed, color='green', linestyle='--', label='Bed temp', linewidth=1.5)
+    axes[0, 1].set_xlabel('Time (s)')
+    axes[0, 1].set_ylabel('Temperature (°C)')
+    axes[0, 1].set_title('Temperature Evolution')
+    axes[0, 1].legend()
+    axes[0, 1].grid(True, alpha=0.3)
+
+    # Plot 3: Vertical temperature profile
+    center_j = Nx // 2
+    axes[1, 0].plot(T[:, center_j], z_nodes*1000, 'b-', linewidth=2)
+    axes[1, 0].set_xlabel('Temperature (°C)')
+    axes[1, 0].set_ylabel('Z height (mm)')
+    axes[1, 0].set_title('Vertical Temperature Profile (Center X)')
+    axes[1, 0].grid(True, alpha=0.3)
+    axes[1, 0].invert_yaxis()
+
+    # Plot 4: Horizontal temperature profile
+    center_i = Nz // 2
+    axes[1, 1].plot(x_nodes*1000, T[center_i, :], 'r-', linewidth=2)
+    axes[1, 1].set_xlabel('X position (mm)')
+    axes[1, 1].set_ylabel('Temperature (°C)')
+    axes[1, 1].set_title(f'Horizontal Temperature Profile (Z = {z_nodes[center_i]*1000:.2f}mm)')
+    axes[1, 1].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig('fff_realistic_validation.png', dpi=150, bbox_inches='tight')
+    print(f"\n✓ Visualization saved to 'fff_realistic_validation.png'")
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()